@@ -1,6 +1,49 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Artist, Album, Track, Comment, Genre
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+from .models import CustomUser, Artist, Album, Track, Comment, Genre, Playlist, PlaylistEntry, ChangeLog
+
+
+def estimate_row_count(model, using='default'):
+    """Оценка числа строк таблицы из статистики СУБД; None, если оценки нет."""
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        'postgresql': ("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table]),
+        'mysql': (
+            "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+            [table],
+        ),
+        'sqlite': ("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]),
+    }
+    if connection.vendor not in queries:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(*queries[connection.vendor])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для больших таблиц без фильтров вместо COUNT(*) берёт оценку из статистики СУБД."""
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+        return super().count
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -25,28 +68,50 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
 
+class PrefixAutocompleteMixin:
+    """Списки ищут по подстроке (search_fields), а виджеты autocomplete_fields —
+    по началу строки: подсказка при наборе отсекает большую часть строк и не
+    тянет в выдачу случайные совпадения из середины названия."""
+
+    def get_search_fields(self, request):
+        fields = super().get_search_fields(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.url_name == 'autocomplete':
+            return tuple(field if field[0] in '^=@$' else f'^{field}' for field in fields)
+        return fields
+
 @admin.register(Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = ('name', 'code')
     search_fields = ('name', 'code')
 
 @admin.register(Artist)
-class ArtistAdmin(admin.ModelAdmin):
+class ArtistAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Album)
-class AlbumAdmin(admin.ModelAdmin):
+class AlbumAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = ('title', 'year')
     search_fields = ('title', 'artists__name')
-    filter_horizontal = ('artists',)
+    autocomplete_fields = ('artists',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Track)
-class TrackAdmin(admin.ModelAdmin):
+class TrackAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = ('title', 'uploaded_by', 'uploaded_at', 'album', 'get_genres_display')
     list_filter = ('uploaded_at', 'genres')
-    search_fields = ('title', 'artists__name', 'uploaded_by', 'genres__name')
-    filter_horizontal = ('artists', 'genres')
+    list_select_related = ('uploaded_by', 'album')
+    search_fields = ('title', 'artists__name', 'uploaded_by__email', 'genres__name')
+    autocomplete_fields = ('artists', 'genres', 'album', 'uploaded_by')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('genres')
 
     def get_genres_display(self, obj):
         return ", ".join([g.name for g in obj.genres.all()]) or "Не указаны"
@@ -56,4 +121,35 @@ class TrackAdmin(admin.ModelAdmin):
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('track', 'author_name', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('track__title', 'author_name')
\ No newline at end of file
+    list_select_related = ('track',)
+    search_fields = ('track__title', 'author_name')
+    autocomplete_fields = ('track', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class PlaylistEntryInline(admin.TabularInline):
+    model = PlaylistEntry
+    autocomplete_fields = ('track',)
+    extra = 0
+
+@admin.register(Playlist)
+class PlaylistAdmin(admin.ModelAdmin):
+    list_display = ('title', 'owner', 'kind', 'updated_at')
+    list_filter = ('kind',)
+    list_select_related = ('owner',)
+    search_fields = ('title', 'owner__email')
+    autocomplete_fields = ('owner',)
+    inlines = (PlaylistEntryInline,)
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ('seq', 'model', 'object_id', 'action', 'changed_at')
+    list_filter = ('model', 'action')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,304 @@
+# music/api.py
+"""
+REST API на DRF.
+
+Модуль импортируется лениво (см. LazyAPIView в music/urls.py), чтобы процессы,
+обслуживающие только HTML-ленту или медиа, не загружали DRF.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import generics, filters, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import Artist, Album, Track, Comment, Genre, Playlist, PlaylistEntry, ChangeLog
+from .serializers import (
+    ArtistSerializer, AlbumSerializer, TrackSerializer, CommentSerializer, CommentThreadSerializer,
+    PlaylistSerializer, PlaylistDetailSerializer, PlaylistEntrySerializer, PlaylistEntryWriteSerializer,
+    PlaylistReorderSerializer, GenreSerializer, SyncAlbumSerializer, SyncTrackSerializer,
+)
+from .fastpath import render_page, render_track_rows
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class CommentCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('created_at', 'id')
+
+class ArtistList(generics.ListCreateAPIView):
+    queryset = Artist.objects.all()
+    serializer_class = ArtistSerializer
+    pagination_class = StandardResultsSetPagination
+
+class ArtistDetail(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Artist.objects.all()
+    serializer_class = ArtistSerializer
+
+class AlbumList(generics.ListCreateAPIView):
+    queryset = Album.objects.all()
+    serializer_class = AlbumSerializer
+    pagination_class = StandardResultsSetPagination
+
+class AlbumDetail(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Album.objects.all()
+    serializer_class = AlbumSerializer
+
+class TrackList(generics.ListCreateAPIView):
+    serializer_class = TrackSerializer
+    pagination_class = StandardResultsSetPagination
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['title', 'genres__name', 'artists__name', 'album__title']
+
+    # Порядок выдачи прежний (по первичному ключу, как SQLite отдавал запрос
+    # без ORDER BY), но теперь явный: без него страницы пагинации нестабильны.
+    ordering = ('id',)
+
+    def get_queryset(self):
+        return Track.objects.filter(status=Track.STATUS_APPROVED).select_related('album').prefetch_related('artists', 'genres').order_by(*self.ordering)
+
+    def list(self, request, *args, **kwargs):
+        # Для JSON страница собирается из .values() и кэша строк; остальные форматы
+        # (BrowsableAPIRenderer) идут через TrackSerializer.
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        tracks = Track.objects.filter(status=Track.STATUS_APPROVED)
+        rows = self.filter_queryset(tracks).order_by(*self.ordering).values_list('pk', 'revision')
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return HttpResponse(b'[' + b','.join(render_track_rows(list(rows), request)) + b']', content_type='application/json')
+        envelope = {
+            'count': self.paginator.page.paginator.count,
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link(),
+        }
+        return HttpResponse(render_page(envelope, render_track_rows(page, request)), content_type='application/json')
+
+class TrackDetail(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Track.objects.all().select_related('album').prefetch_related('artists', 'genres')
+    serializer_class = TrackSerializer
+
+class CommentList(generics.ListCreateAPIView):
+    serializer_class = CommentSerializer
+    pagination_class = StandardResultsSetPagination
+    def get_queryset(self):
+        comments = Comment.objects.select_related('track__album').prefetch_related('track__artists', 'track__album__artists')
+        track_id = self.request.query_params.get('track')
+        if track_id:
+            if not track_id.isdigit():
+                raise ValidationError({'track': 'Ожидается числовой идентификатор трека.'})
+            comments = comments.filter(track_id=track_id)
+        return comments.order_by('created_at', 'id')
+
+class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Comment.objects.all()
+    serializer_class = CommentSerializer
+
+class TrackCommentList(generics.ListCreateAPIView):
+    serializer_class = CommentThreadSerializer
+    pagination_class = CommentCursorPagination
+
+    def get_track(self):
+        if not hasattr(self, '_track'):
+            self._track = get_object_or_404(Track, pk=self.kwargs['pk'], status=Track.STATUS_APPROVED)
+        return self._track
+
+    def get_queryset(self):
+        return Comment.objects.filter(track=self.get_track())
+
+    def perform_create(self, serializer):
+        author = self.request.user if self.request.user.is_authenticated else None
+        serializer.save(track=self.get_track(), author=author)
+
+
+def playlist_with_tracks(queryset):
+    """Плейлист со всеми записями и треками за постоянное число запросов."""
+    entries = PlaylistEntry.objects.select_related('track__album').prefetch_related(
+        'track__artists', 'track__genres', 'track__album__artists',
+    )
+    return queryset.prefetch_related(Prefetch('entries', queryset=entries))
+
+class PlaylistList(generics.ListCreateAPIView):
+    serializer_class = PlaylistSerializer
+    pagination_class = StandardResultsSetPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Playlist.objects.filter(owner=self.request.user, kind=Playlist.KIND_PLAYLIST).order_by('-updated_at', '-id')
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+class PlaylistDetail(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = PlaylistDetailSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return playlist_with_tracks(Playlist.objects.filter(owner=self.request.user))
+
+class PlayQueue(generics.RetrieveAPIView):
+    serializer_class = PlaylistDetailSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        Playlist.objects.get_or_create(owner=self.request.user, kind=Playlist.KIND_QUEUE, defaults={'title': "Очередь"})
+        return playlist_with_tracks(Playlist.objects.filter(owner=self.request.user, kind=Playlist.KIND_QUEUE)).get()
+
+class PlaylistEntryMixin:
+    permission_classes = [IsAuthenticated]
+
+    def get_playlist(self):
+        return get_object_or_404(Playlist, pk=self.kwargs['pk'], owner=self.request.user)
+
+    def get_after(self, playlist, data):
+        after_id = data['after']
+        if after_id is None:
+            return None
+        try:
+            return playlist.entries.get(pk=after_id)
+        except PlaylistEntry.DoesNotExist:
+            raise ValidationError({'after': 'Такой записи нет в плейлисте.'})
+
+    def entry_response(self, entry, status_code=status.HTTP_200_OK):
+        entry = PlaylistEntry.objects.select_related('track__album').prefetch_related(
+            'track__artists', 'track__album__artists',
+        ).get(pk=entry.pk)
+        return Response(PlaylistEntrySerializer(entry, context={'request': self.request}).data, status=status_code)
+
+class PlaylistEntryList(PlaylistEntryMixin, APIView):
+    def post(self, request, pk):
+        playlist = self.get_playlist()
+        serializer = PlaylistEntryWriteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        track = serializer.validated_data.get('track')
+        if track is None:
+            raise ValidationError({'track': 'Обязательное поле.'})
+        if 'after' in serializer.validated_data:
+            entry = playlist.insert(track, after=self.get_after(playlist, serializer.validated_data))
+        else:
+            entry = playlist.append(track)
+        return self.entry_response(entry, status.HTTP_201_CREATED)
+
+class PlaylistEntryDetail(PlaylistEntryMixin, APIView):
+    def get_entry(self, playlist):
+        return get_object_or_404(PlaylistEntry, pk=self.kwargs['entry_pk'], playlist=playlist)
+
+    def patch(self, request, pk, entry_pk):
+        playlist = self.get_playlist()
+        entry = self.get_entry(playlist)
+        serializer = PlaylistEntryWriteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if 'after' not in serializer.validated_data:
+            raise ValidationError({'after': 'Обязательное поле.'})
+        after = self.get_after(playlist, serializer.validated_data)
+        if after is not None and after.pk == entry.pk:
+            raise ValidationError({'after': 'Запись нельзя поставить после самой себя.'})
+        return self.entry_response(playlist.move(entry, after=after))
+
+    def delete(self, request, pk, entry_pk):
+        self.get_entry(self.get_playlist()).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class PlaylistReorder(PlaylistEntryMixin, APIView):
+    def post(self, request, pk):
+        playlist = self.get_playlist()
+        serializer = PlaylistReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entry_ids = serializer.validated_data['entries']
+        existing = set(playlist.entries.values_list('pk', flat=True))
+        if len(entry_ids) != len(existing) or set(entry_ids) != existing:
+            raise ValidationError({'entries': 'Нужно перечислить все записи плейлиста ровно по одному разу.'})
+        playlist.reorder(entry_ids)
+        return Response(PlaylistDetailSerializer(
+            playlist_with_tracks(Playlist.objects.filter(pk=playlist.pk)).get(), context={'request': request},
+        ).data)
+
+
+class ChangeFeed(APIView):
+    """Изменения каталога после since пачками по seq.
+
+    В пачке от каждого объекта остаётся последнее изменение с текущим состоянием
+    объекта; скрытые (неодобренные) и удалённые объекты приходят как delete.
+    Клиент передаёт next из ответа как since следующего запроса, пока has_more.
+
+    seq выдаётся при INSERT, а не при коммите: на PostgreSQL и MySQL транзакция
+    с seq=10 может закоммититься после seq=11, и клиент, уже ушедший к since=11,
+    её пропустил бы. Поэтому записи моложе CHANGE_FEED_SETTLE_SECONDS не отдаются,
+    пока не «осядут»; окно должно перекрывать самую долгую пишущую транзакцию.
+    SQLite выполняет записи по одной, и там окно по умолчанию нулевое.
+    """
+    batch_size = 500
+    max_batch_size = 1000
+    sources = {
+        'genre': (Genre.objects.all(), GenreSerializer),
+        'artist': (Artist.objects.all(), ArtistSerializer),
+        'album': (Album.objects.prefetch_related('artists'), SyncAlbumSerializer),
+        'track': (Track.objects.filter(status=Track.STATUS_APPROVED).prefetch_related('artists', 'genres'), SyncTrackSerializer),
+        'comment': (Comment.objects.filter(track__status=Track.STATUS_APPROVED), CommentThreadSerializer),
+    }
+
+    def get_int_param(self, name, default, maximum=None):
+        value = self.request.query_params.get(name, default)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: 'Ожидается целое число.'})
+        if value < 0:
+            raise ValidationError({name: 'Ожидается неотрицательное число.'})
+        return min(value, maximum) if maximum else value
+
+    def get(self, request):
+        since = self.get_int_param('since', 0)
+        limit = self.get_int_param('limit', self.batch_size, self.max_batch_size) or self.batch_size
+        log = ChangeLog.objects.filter(seq__gt=since)
+        settle = getattr(settings, 'CHANGE_FEED_SETTLE_SECONDS', 0)
+        if settle:
+            log = log.filter(changed_at__lte=timezone.now() - timedelta(seconds=settle))
+        entries = list(
+            log.order_by('seq')
+            .values_list('seq', 'model', 'object_id', 'action')[:limit + 1]
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        latest = {}
+        for seq, model, object_id, action in entries:
+            # Переставляем объект в конец: порядок ответа — по seq последнего изменения.
+            latest.pop((model, object_id), None)
+            latest[(model, object_id)] = (seq, action)
+        ids = {}
+        for model, object_id in latest:
+            ids.setdefault(model, []).append(object_id)
+        states = {}
+        for model, object_ids in ids.items():
+            queryset, serializer_class = self.sources[model]
+            data = serializer_class(queryset.filter(pk__in=object_ids), many=True, context={'request': request}).data
+            states[model] = {item['id']: item for item in data}
+
+        changes = []
+        for (model, object_id), (seq, action) in latest.items():
+            data = states[model].get(object_id)
+            changes.append({
+                'seq': seq,
+                'model': model,
+                'id': object_id,
+                'action': ChangeLog.ACTION_DELETE if data is None else action,
+                'data': data,
+            })
+        return Response({
+            'since': since,
+            'next': entries[-1][0] if entries else since,
+            'has_more': has_more,
+            'changes': changes,
+        })
@@ -0,0 +1,21 @@
+# music/api_throttling.py
+"""
+Класс лимитов для DRF. Вынесен из music/throttling.py: middleware загружается
+при старте каждого рабочего процесса, а DRF — только при первом запросе к API.
+"""
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from .throttling import throttle_wait
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        resolver_match = request.resolver_match
+        scope = resolver_match.url_name if resolver_match else None
+        default = getattr(settings, 'THROTTLE_DEFAULT_API_RATE', None)
+        self._wait = throttle_wait(request, scope, default)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MusicConfig(AppConfig):
     name = 'music'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_throttle_cache(app_configs, **kwargs):
+    """THROTTLE_STORE='cache' на кэше процесса не разделяет лимиты между рабочими процессами."""
+    if not getattr(settings, 'THROTTLE_ENABLED', True) or getattr(settings, 'THROTTLE_STORE', 'local') != 'cache':
+        return []
+    alias = getattr(settings, 'THROTTLE_CACHE', 'default')
+    if settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            f"Кэш '{alias}' для лимитов запросов не общий для рабочих процессов.",
+            hint="Задайте REDIS_URL или другой общий бэкенд в CACHES.",
+            id='music.W002',
+        )]
+    return []
+
+
+@register(Tags.security, deploy=True)
+def check_throttle_store(app_configs, **kwargs):
+    """manage.py check --deploy: лимиты в памяти процесса считаются отдельно в каждом процессе."""
+    if getattr(settings, 'THROTTLE_ENABLED', True) and getattr(settings, 'THROTTLE_STORE', 'local') != 'cache':
+        return [Warning(
+            "THROTTLE_STORE='local': каждый рабочий процесс считает лимиты отдельно.",
+            hint="Задайте THROTTLE_STORE=cache и общий кэш (REDIS_URL).",
+            id='music.W001',
+        )]
+    return []
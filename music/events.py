@@ -0,0 +1,121 @@
+# music/events.py
+"""
+Живые обновления ветки комментариев через Server-Sent Events.
+
+Источник событий — таблица комментариев: поток помнит id последнего
+отправленного комментария и при каждом пробуждении выбирает из базы
+комментарии трека с большим id. Пробуждает поток либо брокер в памяти
+процесса (сигнал post_save после коммита, чтобы комментарий из того же
+ASGI-процесса пришёл сразу), либо таймаут COMMENT_STREAM_POLL_SECONDS —
+так доходят комментарии, созданные другими рабочими процессами. При
+переподключении клиент досылает пропущенное по заголовку Last-Event-ID.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Max
+
+from .models import Comment
+
+POLL_SECONDS = 2
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+BACKLOG_LIMIT = 200
+QUEUE_SIZE = 100
+
+
+class CommentBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, track_id):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[track_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, track_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(track_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[track_id]
+
+    def publish(self, track_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(track_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Event loop подписчика уже закрыт.
+                self.unsubscribe(track_id, (loop, queue))
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # Очередь и так полна пробуждений: новые комментарии поток заберёт из базы.
+        pass
+
+
+broker = CommentBroker()
+
+
+def render_comment(comment):
+    # DRF импортируется при первом событии, а не при загрузке views.py.
+    from rest_framework.renderers import JSONRenderer
+    from .serializers import CommentThreadSerializer
+    return comment.id, JSONRenderer().render(CommentThreadSerializer(comment).data)
+
+
+def format_event(event_id, data):
+    return b'id: %d\nevent: comment\ndata: %s\n\n' % (event_id, data)
+
+
+async def _comments_after(track_id, last_id):
+    comments = Comment.objects.filter(track_id=track_id, id__gt=last_id).order_by('id')[:BACKLOG_LIMIT]
+    return [comment async for comment in comments]
+
+
+async def stream_comments(track_id, last_id=None):
+    poll_seconds = getattr(settings, 'COMMENT_STREAM_POLL_SECONDS', POLL_SECONDS)
+    # Подписываемся до первого запроса к базе, чтобы не пропустить пробуждение между ними.
+    subscriber = broker.subscribe(track_id)
+    _, queue = subscriber
+    try:
+        if last_id is None:
+            latest = await Comment.objects.filter(track_id=track_id).aaggregate(latest=Max('id'))
+            last_id = latest['latest'] or 0
+        yield b'retry: %d\n\n' % RETRY_MILLISECONDS
+        idle = 0
+        while True:
+            comments = await _comments_after(track_id, last_id)
+            for comment in comments:
+                event_id, data = render_comment(comment)
+                last_id = event_id
+                yield format_event(event_id, data)
+            if comments:
+                idle = 0
+            if len(comments) == BACKLOG_LIMIT:
+                continue
+            try:
+                await asyncio.wait_for(queue.get(), poll_seconds)
+            except asyncio.TimeoutError:
+                idle += poll_seconds
+                if idle >= HEARTBEAT_SECONDS:
+                    idle = 0
+                    yield b': keepalive\n\n'
+                continue
+            # Несколько публикаций подряд — один запрос к базе.
+            while not queue.empty():
+                queue.get_nowait()
+    finally:
+        broker.unsubscribe(track_id, subscriber)
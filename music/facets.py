@@ -0,0 +1,231 @@
+# music/facets.py
+"""
+Счётчики фасетов (жанры и исполнители) для фильтров главной страницы.
+
+По одобренным трекам строится индекс: трек получает порядковый номер i,
+а у каждого жанра, исполнителя и альбома есть набор номеров его треков.
+Частые значения (жанры) хранятся битовыми картами — целым числом, в котором
+выставлены биты треков: пересечение — побитовое И, счётчик — int.bit_count().
+Редкие значения (у исполнителя или альбома обычно несколько треков) хранятся
+списками номеров, а для подсчёта есть обратный список «трек -> его значения»:
+обходится только тот трек, что прошёл фильтр, и память не тратится на
+битовые карты, почти целиком состоящие из нулей.
+
+Совпадение с поиском проверяется по тому же правилу, что и icontains ленты
+(см. case_fold), поэтому счётчик в фильтре совпадает с числом треков в списке.
+
+Индекс живёт в памяти процесса и перестраивается, когда меняется токен
+поколения каталога в базе (CacheGeneration): его заменяет invalidate() после
+коммита изменений (см. music/signals.py), и проверка в get_index() видит смену
+во всех рабочих процессах.
+"""
+import bisect
+import string
+import threading
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import chain, compress
+
+from django.db import connection, transaction
+
+from .models import Album, Artist, CacheGeneration, Genre, Track
+
+GENERATION_KEY = 'facets'
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def case_fold(vendor):
+    """Приведение регистра как у icontains в базе: LIKE в SQLite не различает
+    регистр только у латиницы, PostgreSQL сравнивает UPPER() обеих строк."""
+    if vendor == 'sqlite':
+        return lambda text: text.translate(_ASCII_LOWER)
+    return str.upper
+
+
+def _bitmap(indices, size):
+    bits = bytearray(size // 8 + 1)
+    for i in indices:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class Postings:
+    """Треки каждого значения фасета: битовая карта, если значение встречается
+    хотя бы у 1/32 треков (тогда она не больше списка номеров), иначе список."""
+
+    def __init__(self, postings, size):
+        self.size = size
+        self.full = (1 << size) - 1
+        self.sizes = {key: len(positions) for key, positions in postings.items()}
+        self.dense = {}
+        self.sparse = {}
+        by_track = defaultdict(list)
+        for key, positions in postings.items():
+            if len(positions) * 32 >= size:
+                self.dense[key] = _bitmap(positions, size)
+            else:
+                self.sparse[key] = array('q', positions)
+                for i in positions:
+                    by_track[i].append(key)
+        # Редкие значения каждого трека (у трека без них — общий пустой кортеж).
+        self._by_track = [tuple(by_track.get(i, ())) for i in range(size)]
+
+    def bitmap(self, keys):
+        """Битовая карта треков, у которых есть хотя бы одно из значений keys."""
+        result, positions = 0, []
+        for key in keys:
+            if key in self.dense:
+                result |= self.dense[key]
+            else:
+                positions.extend(self.sparse.get(key, ()))
+        return result | _bitmap(positions, self.size)
+
+    def _count_sparse(self, mask):
+        bits = bin(mask)[:1:-1]  # младший бит первым: символ i — трек i
+        return Counter(chain.from_iterable(compress(self._by_track, map('1'.__eq__, bits))))
+
+    def counts(self, mask):
+        """{значение: число треков из mask}; значения с нулём не попадают в результат."""
+        if mask == self.full:
+            return dict(self.sizes)
+        result = {key: count for key, bits in self.dense.items() if (count := (bits & mask).bit_count())}
+        # Обходим меньшую сторону: треки из mask либо те, что в него не попали.
+        if mask.bit_count() * 2 <= self.size:
+            result.update(self._count_sparse(mask))
+        else:
+            missing = self._count_sparse(self.full & ~mask)
+            for key, total in self.sizes.items():
+                if key in self.sparse and (count := total - missing.get(key, 0)):
+                    result[key] = count
+        return result
+
+
+class FacetIndex:
+    def __init__(self):
+        tracks = list(
+            Track.objects.filter(status=Track.STATUS_APPROVED).order_by('pk').values_list('pk', 'title', 'album_id')
+        )
+        position = {pk: i for i, (pk, _, _) in enumerate(tracks)}
+        size = len(tracks)
+        self.all = (1 << size) - 1
+        self.fold = fold = case_fold(connection.vendor)
+
+        # Названия склеены в одну строку: поиск подстроки идёт через str.find в C,
+        # а номер трека по смещению находится бинарным поиском.
+        titles = [fold(title) for _, title, _ in tracks]
+        self._haystack = '\n'.join(titles)
+        self._offsets = []
+        offset = 0
+        for title in titles:
+            self._offsets.append(offset)
+            offset += len(title) + 1
+
+        by_album = defaultdict(list)
+        for i, (_, _, album_id) in enumerate(tracks):
+            if album_id is not None:
+                by_album[album_id].append(i)
+        self.albums = Postings(by_album, size)
+        self.album_titles = {
+            pk: fold(title) for pk, title in Album.objects.filter(pk__in=by_album).values_list('pk', 'title')
+        }
+
+        self.genres = Postings(self._postings(Track.genres.through, 'genre_id', position), size)
+        self.genre_names = {pk: fold(name) for pk, name in Genre.objects.values_list('pk', 'name')}
+        self.genre_codes = dict(Genre.objects.values_list('code', 'pk'))
+
+        self.artists = Postings(self._postings(Track.artists.through, 'artist_id', position), size)
+        self.artist_names = {pk: fold(name) for pk, name in Artist.objects.values_list('pk', 'name')}
+
+        self.search = lru_cache(maxsize=256)(self._search)
+
+    @staticmethod
+    def _postings(through, field, position):
+        postings = defaultdict(list)
+        for track_id, key in through.objects.values_list('track_id', field):
+            if track_id in position:
+                postings[key].append(position[track_id])
+        return postings
+
+    @staticmethod
+    def _matching(postings, names, query):
+        return postings.bitmap(pk for pk, name in names.items() if query in name)
+
+    def _search(self, query):
+        """Треки, у которых запрос входит в название, жанр, исполнителя или альбом."""
+        query = self.fold(query)
+        matched = []
+        start = self._haystack.find(query) if '\n' not in query else -1
+        while start != -1:
+            i = bisect.bisect_right(self._offsets, start) - 1
+            matched.append(i)
+            next_title = self._offsets[i + 1] if i + 1 < len(self._offsets) else len(self._haystack)
+            start = self._haystack.find(query, next_title)
+        result = _bitmap(matched, len(self._offsets))
+        result |= self._matching(self.genres, self.genre_names, query)
+        result |= self._matching(self.artists, self.artist_names, query)
+        result |= self._matching(self.albums, self.album_titles, query)
+        return result
+
+    def counts(self, search='', genre='', artist=''):
+        """Счётчики по фасетам для текущей комбинации фильтров.
+
+        Счётчик жанра не учитывает выбранный жанр (только поиск и исполнителя),
+        счётчик исполнителя — выбранного исполнителя: так видно, сколько треков
+        останется, если переключить этот фильтр. Значений с нулём в словарях нет."""
+        matched = self.search(search) if search else self.all
+        genre_bits = self.genres.bitmap([self.genre_codes.get(genre)]) if genre else self.all
+        artist_bits = self._matching(self.artists, self.artist_names, self.fold(artist)) if artist else self.all
+        for_genres = matched & artist_bits
+        for_artists = matched & genre_bits
+        return {
+            'total': (for_genres & genre_bits).bit_count(),
+            'genres': self.genres.counts(for_genres),
+            'artists': self.artists.counts(for_artists),
+        }
+
+
+_index = None
+_index_generation = None
+_lock = threading.Lock()
+
+
+def get_index():
+    global _index, _index_generation
+    generation = CacheGeneration.current(GENERATION_KEY)
+    if _index is None or _index_generation != generation:
+        with _lock:
+            if _index is None or _index_generation != generation:
+                _index = FacetIndex()
+                _index_generation = generation
+    return _index
+
+
+def invalidate():
+    CacheGeneration.bump(GENERATION_KEY)
+
+
+class _PendingInvalidation:
+    def __init__(self):
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        invalidate()
+
+
+def invalidate_on_commit(using=None):
+    """Ставит invalidate() на коммит текущей транзакции — один раз, сколько бы
+    строк каталога она ни изменила. После отката транзакции или точки сохранения
+    отложенный вызов пропадает из run_on_commit, и следующий ставится заново."""
+    conn = transaction.get_connection(using)
+    pending = getattr(conn, 'facets_invalidation', None)
+    if pending is not None and not pending.done and any(func is pending for _, func, _ in conn.run_on_commit):
+        return
+    conn.facets_invalidation = _PendingInvalidation()
+    transaction.on_commit(conn.facets_invalidation, using=using)
+
+
+def facet_counts(search='', genre='', artist=''):
+    return get_index().counts(search, genre, artist)
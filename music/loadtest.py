@@ -0,0 +1,357 @@
+# music/loadtest.py
+"""
+Нагрузочное тестирование: синтетическая смесь запросов к запущенному серверу.
+
+Клиент написан на asyncio поверх сырых TCP-соединений (HTTP/1.1,
+одно соединение на запрос), поэтому не требует внешних пакетов и сервисов.
+Виртуальные слушатели в цикле выбирают сценарий по весам смеси: листание
+ленты, поиск, автодополнение по мере набора, чтение аудио диапазонами,
+загрузка трека и комментарий. По каждому типу запроса собираются
+пропускная способность и перцентили задержки, а по посекундным окнам —
+всплески ошибок, задержек и блокировок базы ("database is locked").
+
+Запуск: python manage.py loadtest --start-server (см. команду loadtest).
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_MIX = {
+    'feed': 35,
+    'search': 15,
+    'autocomplete': 20,
+    'audio': 15,
+    'comment': 10,
+    'upload': 5,
+}
+LOCKED_MARKERS = (b'database is locked', b'database table is locked')
+
+
+def parse_mix(text):
+    """'feed=40,search=20' -> {'feed': 40, 'search': 20}."""
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Неизвестный сценарий: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по ближайшему рангу для уже отсортированного списка."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def header(self, name, default=None):
+        values = self.headers.get(name.lower())
+        return values[-1] if values else default
+
+
+class Client:
+    """HTTP/1.1-клиент с простым хранилищем cookies (одно на виртуального слушателя)."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def request(self, method, path, body=b'', headers=None):
+        return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+
+    async def _request(self, method, path, body, headers):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            lines = [
+                f'{method} {path} HTTP/1.1',
+                f'Host: {self.host}:{self.port}',
+                'Connection: close',
+                f'Content-Length: {len(body)}',
+            ]
+            if self.cookies:
+                lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+            lines.extend(f'{name}: {value}' for name, value in headers.items())
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            response_headers = defaultdict(list)
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                response_headers[name.strip().lower()].append(value.strip())
+            if 'content-length' in response_headers:
+                data = await reader.readexactly(int(response_headers['content-length'][-1]))
+            elif 'chunked' in ''.join(response_headers.get('transfer-encoding', [])):
+                data = await self._read_chunked(reader)
+            else:
+                data = await reader.read()
+        finally:
+            writer.close()
+        for cookie in response_headers.get('set-cookie', []):
+            name, _, value = cookie.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+        return Response(status, response_headers, data)
+
+    @staticmethod
+    async def _read_chunked(reader):
+        data = bytearray()
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                return bytes(data)
+            data += await reader.readexactly(size)
+            await reader.readline()
+
+    async def get(self, path, params=None, headers=None):
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        return await self.request('GET', path, headers=headers)
+
+    def csrf_headers(self, path):
+        headers = {'Referer': f'http://{self.host}:{self.port}{path}'}
+        if 'csrftoken' in self.cookies:
+            headers['X-CSRFToken'] = self.cookies['csrftoken']
+        return headers
+
+    async def post_form(self, path, fields, files=None):
+        headers = self.csrf_headers(path)
+        if 'X-CSRFToken' in headers:
+            fields = {**fields, 'csrfmiddlewaretoken': headers['X-CSRFToken']}
+        if not files:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            return await self.request('POST', path, urlencode(fields).encode('utf-8'), headers)
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+            )
+        for name, (filename, content, content_type) in files.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8') + content + b'\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+        headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        return await self.request('POST', path, b''.join(parts), headers)
+
+    async def post_json(self, path, data):
+        # После входа DRF проверяет CSRF для сессионной аутентификации.
+        body = json.dumps(data).encode('utf-8')
+        return await self.request('POST', path, body, {**self.csrf_headers(path), 'Content-Type': 'application/json'})
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.samples = defaultdict(list)
+
+    def record(self, endpoint, started, latency, status, locked=False, error=None):
+        self.samples[endpoint].append((started - self.started, latency, status, locked, error))
+
+    def report(self, duration, error_threshold=0.05, latency_factor=3.0, min_requests=5):
+        endpoints = {}
+        buckets = defaultdict(list)
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(sample[1] for sample in samples)
+            errors = sum(1 for sample in samples if _is_error(sample))
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': errors,
+                'throttled': sum(1 for sample in samples if sample[2] == 429),
+                'statuses': dict(sorted(Counter(sample[2] for sample in samples).items())),
+                'locked': sum(1 for sample in samples if sample[3]),
+                'rps': len(samples) / duration if duration else 0.0,
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p90_ms': percentile(latencies, 0.90) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+            }
+            for sample in samples:
+                buckets[int(sample[0])].append(sample)
+
+        # Базовый уровень — медиана посекундных p95: всплеск заметен на фоне обычной смеси запросов.
+        windows = []
+        for second, samples in sorted(buckets.items()):
+            if len(samples) >= min_requests:
+                windows.append((second, samples, percentile(sorted(sample[1] for sample in samples), 0.95)))
+        baseline = percentile(sorted(window[2] for window in windows), 0.5)
+        spikes = []
+        for second, samples, p95 in windows:
+            errors = sum(1 for sample in samples if _is_error(sample))
+            locked = sum(1 for sample in samples if sample[3])
+            if locked:
+                spikes.append({'second': second, 'kind': 'lock', 'count': locked, 'requests': len(samples)})
+            if errors / len(samples) > error_threshold:
+                spikes.append({'second': second, 'kind': 'errors', 'count': errors, 'requests': len(samples)})
+            if baseline and p95 > latency_factor * baseline:
+                spikes.append({'second': second, 'kind': 'latency', 'p95_ms': p95 * 1000, 'baseline_ms': baseline * 1000})
+        total = sum(len(samples) for samples in self.samples.values())
+        return {
+            'duration': duration,
+            'requests': total,
+            'rps': total / duration if duration else 0.0,
+            'endpoints': endpoints,
+            'spikes': spikes,
+        }
+
+
+def _is_error(sample):
+    _, _, status, locked, error = sample
+    # 429 учитывается отдельно (throttled); остальные 4xx — ошибки сценария.
+    return error is not None or locked or status == 0 or (status >= 400 and status != 429)
+
+
+class Catalog:
+    """Что известно о каталоге сервера: треки, адреса аудио и имена исполнителей."""
+
+    def __init__(self, tracks, artists):
+        self.tracks = tracks
+        self.artists = artists
+        self.words = sorted({word for track in tracks for word in re.findall(r'\w{3,}', track['title'].lower())})
+
+    @classmethod
+    async def discover(cls, client, limit=100):
+        tracks = json.loads((await client.get('/api/tracks/', {'page_size': limit})).body)['results']
+        artists = json.loads((await client.get('/api/artists/', {'page_size': limit})).body)['results']
+        return cls(
+            [{'id': t['id'], 'title': t['title'], 'audio': t['audio_file'] and urlsplit(t['audio_file']).path}
+             for t in tracks],
+            [a['name'] for a in artists],
+        )
+
+
+class LoadTest:
+    def __init__(self, base_url, mix=None, concurrency=10, duration=30.0, think_time=0.0,
+                 email=None, password=None, range_size=64 * 1024, error_threshold=0.05, seed=None):
+        self.base_url = base_url
+        self.mix = mix or DEFAULT_MIX
+        self.concurrency = concurrency
+        self.duration = duration
+        self.think_time = think_time
+        self.email = email
+        self.password = password
+        self.range_size = range_size
+        self.error_threshold = error_threshold
+        self.rng = random.Random(seed)
+        self.stats = Stats()
+        self.catalog = None
+
+    async def timed(self, endpoint, call, expect_redirect=False):
+        started = time.monotonic()
+        try:
+            response = await call
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError) as error:
+            self.stats.record(endpoint, started, time.monotonic() - started, 0, error=repr(error))
+            return None
+        latency = time.monotonic() - started
+        locked = response.status >= 500 and any(marker in response.body for marker in LOCKED_MARKERS)
+        # Формы при ошибке валидации отвечают 200 с той же страницей, успех — редирект.
+        error = 'form rejected' if expect_redirect and response.status == 200 else None
+        self.stats.record(endpoint, started, latency, response.status, locked=locked, error=error)
+        return response
+
+    async def scenario_feed(self, client):
+        params = {'page': self.rng.randint(1, 5), 'page_size': self.rng.choice([6, 12, 24])}
+        await self.timed('feed', client.get('/', params))
+
+    async def scenario_search(self, client):
+        if self.catalog.words:
+            await self.timed('search', client.get('/', {'search': self.rng.choice(self.catalog.words)}))
+
+    async def scenario_autocomplete(self, client):
+        # Каждое нажатие клавиши — отдельный запрос, как в форме загрузки.
+        if not self.catalog.artists:
+            return
+        name = self.rng.choice(self.catalog.artists)
+        for length in range(1, min(len(name), 6) + 1):
+            await self.timed('autocomplete', client.get('/api/artists/search/', {'q': name[:length]}))
+
+    async def scenario_audio(self, client):
+        tracks = [track for track in self.catalog.tracks if track['audio']]
+        if not tracks:
+            return
+        path = self.rng.choice(tracks)['audio']
+        start = self.rng.randrange(0, 4) * self.range_size
+        await self.timed('audio', client.get(path, headers={'Range': f'bytes={start}-{start + self.range_size - 1}'}))
+
+    async def scenario_comment(self, client):
+        if not self.catalog.tracks:
+            return
+        track = self.rng.choice(self.catalog.tracks)
+        data = {'author_name': 'Нагрузка', 'text': f'Комментарий {self.rng.random():.6f}'}
+        await self.timed('comment', client.post_json(f"/api/tracks/{track['id']}/comments/", data))
+
+    async def scenario_upload(self, client):
+        if not self.email:
+            return
+        if 'sessionid' not in client.cookies:
+            await self.timed('login', client.get('/login/'))
+            await self.timed('login', client.post_form('/login/', {'email': self.email, 'password': self.password}),
+                             expect_redirect=True)
+        await self.timed('upload', client.get('/upload/'))
+        audio = ('load.mp3', self.rng.randbytes(32 * 1024), 'audio/mpeg')
+        fields = {'title': f'Нагрузка {uuid.uuid4().hex[:8]}', 'artist_names': 'Нагрузочный исполнитель'}
+        await self.timed('upload', client.post_form('/upload/', fields, files={'audio_file': audio}),
+                         expect_redirect=True)
+
+    async def listener(self, deadline):
+        client = Client(self.base_url)
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while time.monotonic() < deadline:
+            scenario = self.rng.choices(names, weights)[0]
+            await getattr(self, f'scenario_{scenario}')(client)
+            if self.think_time:
+                await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+    async def run(self):
+        self.catalog = await Catalog.discover(Client(self.base_url))
+        self.stats = Stats()
+        deadline = time.monotonic() + self.duration
+        await asyncio.gather(*(self.listener(deadline) for _ in range(self.concurrency)))
+        return self.stats.report(time.monotonic() - self.stats.started, error_threshold=self.error_threshold)
+
+
+def format_report(report):
+    lines = [
+        f"Запросов: {report['requests']} за {report['duration']:.1f} с ({report['rps']:.1f} запр/с)",
+        '',
+        f"{'Запрос':<14}{'всего':>8}{'ошибок':>8}{'429':>6}{'запр/с':>9}{'p50 мс':>9}{'p90 мс':>9}{'p99 мс':>9}{'max мс':>9}",
+    ]
+    for endpoint, stats in report['endpoints'].items():
+        lines.append(
+            f"{endpoint:<14}{stats['requests']:>8}{stats['errors']:>8}{stats['throttled']:>6}{stats['rps']:>9.1f}"
+            f"{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+        )
+    lines.append('')
+    if not report['spikes']:
+        lines.append("Всплесков ошибок, задержек и блокировок не обнаружено.")
+    for spike in report['spikes']:
+        if spike['kind'] == 'latency':
+            lines.append(
+                f"[{spike['second']} с] всплеск задержки: p95 {spike['p95_ms']:.0f} мс "
+                f"при обычных {spike['baseline_ms']:.0f} мс"
+            )
+        elif spike['kind'] == 'lock':
+            lines.append(f"[{spike['second']} с] блокировки базы: {spike['count']} из {spike['requests']} запросов")
+        else:
+            lines.append(f"[{spike['second']} с] всплеск ошибок: {spike['count']} из {spike['requests']} запросов")
+    return '\n'.join(lines)
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from music.api import TrackList
+from music.fastpath import dumps, project_tracks, render_page, render_track_rows
+from music.models import Track
+from music.serializers import TrackSerializer
+
+
+class Command(BaseCommand):
+    help = "Сравнивает время сборки страницы /api/tracks/ через TrackSerializer и через быстрый путь (холодный и тёплый кэш строк)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50, help="Сколько треков на странице.")
+        parser.add_argument('--repeat', type=int, default=20, help="Сколько раз собирать страницу в каждом режиме.")
+
+    def handle(self, *args, **options):
+        page_size, repeat = options['page_size'], options['repeat']
+        request = Request(APIRequestFactory().get('/api/tracks/'))
+        tracks = Track.objects.filter(status=Track.STATUS_APPROVED).order_by(*TrackList.ordering)
+        ids = list(tracks.values_list('pk', flat=True)[:page_size])
+        if not ids:
+            raise CommandError("Нет одобренных треков; сначала python manage.py seed_catalog.")
+
+        def serializer_page():
+            page = (
+                Track.objects.filter(pk__in=ids).select_related('album')
+                .prefetch_related('artists', 'genres').order_by(*TrackList.ordering)
+            )
+            JSONRenderer().render(TrackSerializer(page, many=True, context={'request': request}).data)
+
+        def fast_page():
+            rows = list(tracks.filter(pk__in=ids).values_list('pk', 'revision'))
+            render_page({'count': len(rows)}, render_track_rows(rows, request))
+
+        def cold_fast_page():
+            # То же, что при пустом кэше строк, но без очистки общего кэша.
+            rows = list(tracks.filter(pk__in=ids).values_list('pk', 'revision'))
+            projected = project_tracks([pk for pk, _ in rows], request)
+            render_page({'count': len(rows)}, [dumps(projected[pk]) for pk, _ in rows])
+
+        timings = {}
+        for name, func in (('serializer', serializer_page), ('fast, cold', cold_fast_page), ('fast, warm', fast_page)):
+            func()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            timings[name] = (time.perf_counter() - start) / repeat
+
+        self.stdout.write(f"Страница из {len(ids)} треков, {repeat} повторов:")
+        for name, seconds in timings.items():
+            speedup = timings['serializer'] / seconds if seconds else float('inf')
+            self.stdout.write(f"  {name:<12} {seconds * 1000:8.2f} мс  x{speedup:.1f}")
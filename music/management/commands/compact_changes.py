@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from music.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = "Сжимает журнал изменений: от старых записей о каждом объекте остаётся только последняя."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=float, default=7, help="Сжимать записи старше этого срока.")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['older_than_days'])
+        removed = ChangeLog.compact(before)
+        self.stdout.write(self.style.SUCCESS(f"Удалено записей журнала: {removed}, осталось: {ChangeLog.objects.count()}"))
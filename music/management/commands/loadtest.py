@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from music.loadtest import DEFAULT_MIX, LoadTest, format_report, parse_mix
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError("Сервер завершился при запуске.")
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Сервер не ответил за {timeout} с.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет смесь запросов (лента, поиск, автодополнение, аудио, комментарии, загрузки) "
+        "и печатает пропускную способность, перцентили задержки и всплески ошибок."
+    )
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--url', help="Адрес уже запущенного сервера, например http://127.0.0.1:8000")
+        target.add_argument(
+            '--start-server', action='store_true',
+            help="Поднять сервер на временной базе с синтетическим каталогом и остановить его по окончании.",
+        )
+        parser.add_argument('--duration', type=float, default=30.0, help="Длительность прогона в секундах.")
+        parser.add_argument('--concurrency', type=int, default=20, help="Число виртуальных слушателей.")
+        parser.add_argument(
+            '--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+            help="Веса сценариев: feed, search, autocomplete, audio, comment, upload.",
+        )
+        parser.add_argument('--think-time', type=float, default=0.0, help="Средняя пауза между действиями, с.")
+        parser.add_argument('--seed-tracks', type=int, default=2000, help="Размер каталога для --start-server.")
+        parser.add_argument('--email', default='loadtest@example.com', help="Пользователь для загрузок.")
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--error-threshold', type=float, default=0.05, help="Доля ошибок в секунде для всплеска.")
+        parser.add_argument('--json', action='store_true', help="Вывести отчёт в JSON.")
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(str(error))
+        if not options['start_server']:
+            return self.run(options['url'].rstrip('/'), mix, options)
+
+        workdir = tempfile.mkdtemp(prefix='musiclib-loadtest-')
+        env = {
+            **os.environ,
+            'DATABASE_NAME': os.path.join(workdir, 'db.sqlite3'),
+            'MEDIA_ROOT': os.path.join(workdir, 'media'),
+            # Лимиты запросов отключены: меряем сервер, а не троттлинг. DEBUG нужен для раздачи media.
+            'THROTTLE_ENABLED': 'False',
+            'DEBUG': 'True',
+        }
+        manage = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py')]
+        process = None
+        try:
+            self.stderr.write("Подготовка временной базы и каталога...")
+            for command in (
+                ['migrate', '--noinput'],
+                ['seed_catalog', '--tracks', str(options['seed_tracks']),
+                 '--email', options['email'], '--password', options['password']],
+            ):
+                result = subprocess.run(manage + command, env=env, capture_output=True, text=True)
+                if result.returncode != 0:
+                    raise CommandError(result.stderr[-2000:])
+            port = free_port()
+            url = f'http://127.0.0.1:{port}'
+            process = subprocess.Popen(
+                manage + ['runserver', '--noreload', f'127.0.0.1:{port}'],
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            wait_until_ready(url + '/api/artists/', process)
+            self.run(url, mix, options)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run(self, url, mix, options):
+        loadtest = LoadTest(
+            url, mix=mix, concurrency=options['concurrency'], duration=options['duration'],
+            think_time=options['think_time'], email=options['email'], password=options['password'],
+            error_threshold=options['error_threshold'], seed=options['seed'],
+        )
+        self.stderr.write(f"Нагрузка на {url}: {options['concurrency']} слушателей, {options['duration']:.0f} с...")
+        report = asyncio.run(loadtest.run())
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2) if options['json'] else format_report(report))
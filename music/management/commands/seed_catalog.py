@@ -0,0 +1,107 @@
+import random
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from music import facets
+from music.models import Album, Artist, ChangeLog, Comment, CustomUser, Genre, Track
+
+WORDS = [
+    'ветер', 'город', 'ночь', 'звезда', 'река', 'огонь', 'дорога', 'небо', 'море', 'песня',
+    'лето', 'осень', 'снег', 'свет', 'тень', 'сон', 'время', 'дом', 'поезд', 'крыша',
+    'blue', 'night', 'river', 'fire', 'road', 'dream', 'light', 'storm', 'echo', 'gold',
+]
+GENRES = [
+    ('Рок', 'rock'), ('Поп', 'pop'), ('Джаз', 'jazz'), ('Блюз', 'blues'), ('Электроника', 'electronic'),
+    ('Хип-хоп', 'hiphop'), ('Классика', 'classical'), ('Фолк', 'folk'), ('Метал', 'metal'), ('Панк', 'punk'),
+]
+
+
+def phrase(rng, words=2):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+class Command(BaseCommand):
+    help = "Заполняет базу синтетическим каталогом для нагрузочного тестирования."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tracks', type=int, default=1000)
+        parser.add_argument('--artists', type=int, default=200)
+        parser.add_argument('--albums', type=int, default=150)
+        parser.add_argument('--comments', type=int, default=3000)
+        parser.add_argument('--audio-files', type=int, default=10, help="Сколько разных аудиофайлов делят треки.")
+        parser.add_argument('--audio-size', type=int, default=256 * 1024, help="Размер аудиофайла в байтах.")
+        parser.add_argument('--email', default='loadtest@example.com', help="Пользователь для загрузок.")
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--seed', type=int, default=1)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user, _ = CustomUser.objects.get_or_create(
+            email=options['email'], defaults={'username': options['email']},
+        )
+        user.set_password(options['password'])
+        user.save()
+
+        genres = [Genre.objects.get_or_create(code=code, defaults={'name': name})[0] for name, code in GENRES]
+        existing_artists = set(Artist.objects.values_list('name', flat=True))
+        new_artists = Artist.objects.bulk_create(
+            [Artist(name=name) for name in {f"{phrase(rng)} {i}" for i in range(options['artists'])} - existing_artists]
+        )
+        artists = list(Artist.objects.all())
+        existing_albums = set(Album.objects.values_list('title', flat=True))
+        new_albums = Album.objects.bulk_create(
+            [Album(title=title, year=rng.randint(1960, 2025))
+             for title in {f"{phrase(rng, 3)} {i}" for i in range(options['albums'])} - existing_albums]
+        )
+        albums = list(Album.objects.all())
+        Album.artists.through.objects.bulk_create(
+            [Album.artists.through(album_id=album.pk, artist_id=rng.choice(artists).pk) for album in albums],
+            ignore_conflicts=True,
+        )
+
+        field = Track._meta.get_field('audio_file')
+        audio_names = [
+            field.storage.save(
+                field.generate_filename(None, f'seed{i}.mp3'),
+                ContentFile(rng.randbytes(options['audio_size'])),
+            )
+            for i in range(options['audio_files'])
+        ]
+        tracks = Track.objects.bulk_create([
+            Track(
+                title=phrase(rng, rng.randint(1, 3)),
+                audio_file=rng.choice(audio_names),
+                uploaded_by=user,
+                album=rng.choice(albums) if rng.random() < 0.7 else None,
+                status=Track.STATUS_APPROVED,
+                revision=1,
+            )
+            for _ in range(options['tracks'])
+        ])
+        Track.artists.through.objects.bulk_create([
+            Track.artists.through(track_id=track.pk, artist_id=artist.pk)
+            for track in tracks for artist in rng.sample(artists, rng.randint(1, 2))
+        ])
+        Track.genres.through.objects.bulk_create([
+            Track.genres.through(track_id=track.pk, genre_id=genre.pk)
+            for track in tracks for genre in rng.sample(genres, rng.randint(1, 2))
+        ])
+        comments = Comment.objects.bulk_create([
+            Comment(track=rng.choice(tracks), author_name=phrase(rng, 1), text=phrase(rng, 6))
+            for _ in range(options['comments'] if tracks else 0)
+        ])
+        # bulk_create не шлёт сигналы, поэтому журнал изменений и индекс фасетов обновляем явно.
+        ChangeLog.record(Artist, [artist.pk for artist in new_artists], ChangeLog.ACTION_CREATE)
+        created_albums = {album.pk for album in new_albums}
+        ChangeLog.record(Album, sorted(created_albums), ChangeLog.ACTION_CREATE)
+        ChangeLog.record(Album, [album.pk for album in albums if album.pk not in created_albums])
+        ChangeLog.record(Track, [track.pk for track in tracks], ChangeLog.ACTION_CREATE)
+        ChangeLog.record(Comment, [comment.pk for comment in comments], ChangeLog.ACTION_CREATE)
+        facets.invalidate_on_commit()
+        self.stdout.write(self.style.SUCCESS(
+            f"Каталог: треков {len(tracks)}, исполнителей {len(artists)}, альбомов {len(albums)}, "
+            f"комментариев {len(comments)}. Пользователь для загрузок: {user.email}"
+        ))
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from music.models import ChangeLog, Track
+from music.storage import is_sharded, shard_name
+
+
+class Command(BaseCommand):
+    help = "Переносит аудиофайлы треков в шардированные подкаталоги и обновляет пути в Track.audio_file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Число параллельных потоков переноса.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Сколько треков обновлять за один запрос.")
+        parser.add_argument('--dry-run', action='store_true', help="Только показать, что будет перенесено.")
+
+    def handle(self, *args, **options):
+        self.storage = Track._meta.get_field('audio_file').storage
+        pending = [
+            (pk, name)
+            for pk, name in Track.objects.order_by('pk').values_list('pk', 'audio_file')
+            if name and not is_sharded(name)
+        ]
+        if options['dry_run']:
+            for pk, name in pending:
+                self.stdout.write(f"{pk}: {name} -> {shard_name(name, key=pk)}")
+            self.stdout.write(f"К переносу: {len(pending)}")
+            return
+
+        moved = failed = 0
+        items = iter(pending)
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while batch := list(islice(items, options['batch_size'])):
+                results = list(executor.map(self.copy_file, batch))
+                copied = [(pk, old, new) for pk, old, new, error in results if not error]
+                for pk, old, _, error in results:
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"{pk}: {old}: {error}")
+                # Путь в базе меняем только после копирования, старый файл удаляем после обновления базы:
+                # прерванный запуск не оставляет треков со ссылкой на несуществующий файл.
+                Track.objects.bulk_update(
+                    [Track(pk=pk, audio_file=new, revision=F('revision') + 1) for pk, _, new in copied],
+                    ['audio_file', 'revision'],
+                )
+                ChangeLog.record(Track, [pk for pk, _, _ in copied])
+                list(executor.map(self.storage.delete, [old for _, old, _ in copied]))
+                moved += len(copied)
+        self.stdout.write(self.style.SUCCESS(f"Перенесено: {moved}, ошибок: {failed}"))
+
+    def copy_file(self, item):
+        pk, old = item
+        try:
+            new = self.storage.get_available_name(shard_name(old, key=pk))
+            if not self.link_file(old, new):
+                with self.storage.open(old) as source:
+                    new = self.storage.save(new, source)
+        except OSError as error:
+            return pk, old, None, error
+        return pk, old, new, None
+
+    def link_file(self, old, new):
+        """На локальном диске вместо копирования создаём жёсткую ссылку."""
+        try:
+            old_path, new_path = self.storage.path(old), self.storage.path(new)
+        except NotImplementedError:
+            return False
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        try:
+            os.link(old_path, new_path)
+        except OSError:
+            return False
+        return True
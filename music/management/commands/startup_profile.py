@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Холодный старт рабочего процесса: настройка Django, цепочка middleware и URLconf.
+WORKER_BOOT = """
+import json, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss_kb //= 1024
+except ImportError:
+    rss_kb = None
+print(json.dumps({'seconds': elapsed, 'rss_kb': rss_kb, 'modules': sorted(sys.modules)}))
+"""
+
+
+def boot_worker(settings_module, importtime=False):
+    """Запускает холодный старт в отдельном процессе. Возвращает (замеры, stderr)."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', WORKER_BOOT]
+    result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise CommandError(f"Рабочий процесс не запустился:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def parse_importtime(stderr):
+    """Строки вида 'import time: self | cumulative | name' -> [(name, self_us, cumulative_us)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Профиль холодного старта рабочего процесса (python -X importtime) с проверкой бюджетов времени и памяти."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'musiclib.settings'))
+        parser.add_argument('--limit', type=int, default=15, help="Сколько строк выводить в каждом разделе.")
+        parser.add_argument('--max-seconds', type=float, help="Бюджет времени холодного старта.")
+        parser.add_argument('--max-rss-mb', type=float, help="Бюджет пиковой памяти процесса (RSS).")
+        parser.add_argument('--forbid', nargs='*', default=[], help="Модули, которые не должны загружаться при старте.")
+
+    def handle(self, *args, **options):
+        settings_module = options['settings_module']
+        limit = options['limit']
+        _, stderr = boot_worker(settings_module, importtime=True)
+        rows = parse_importtime(stderr)
+        by_package = defaultdict(int)
+        for name, self_us, _ in rows:
+            by_package[name.split('.')[0]] += self_us
+
+        self.stdout.write(f"Профиль: {settings_module}, модулей импортировано: {len(rows)}")
+        self.stdout.write("\nПакеты по собственному времени импорта:")
+        for package, total in sorted(by_package.items(), key=lambda item: -item[1])[:limit]:
+            self.stdout.write(f"  {total / 1000:8.1f} мс  {package}")
+        self.stdout.write("\nМодули по накопленному времени импорта:")
+        for name, _, cumulative in sorted(rows, key=lambda row: -row[2])[:limit]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} мс  {name}")
+
+        # Время и память меряем отдельным запуском: -X importtime сам замедляет импорт.
+        stats, _ = boot_worker(settings_module)
+        rss_mb = stats['rss_kb'] / 1024 if stats['rss_kb'] is not None else None
+        self.stdout.write(f"\nХолодный старт: {stats['seconds']:.3f} с")
+        if rss_mb is not None:
+            self.stdout.write(f"Пиковая память (RSS): {rss_mb:.1f} МБ")
+
+        errors = []
+        if options['max_seconds'] is not None and stats['seconds'] > options['max_seconds']:
+            errors.append(f"холодный старт {stats['seconds']:.3f} с > {options['max_seconds']} с")
+        if options['max_rss_mb'] is not None and rss_mb is not None and rss_mb > options['max_rss_mb']:
+            errors.append(f"RSS {rss_mb:.1f} МБ > {options['max_rss_mb']} МБ")
+        loaded = set(stats['modules'])
+        errors.extend(f"при старте загружен {module}" for module in options['forbid'] if module in loaded)
+        if errors:
+            raise CommandError("Бюджет запуска превышен: " + "; ".join(errors))
+        self.stdout.write(self.style.SUCCESS("Бюджеты запуска соблюдены."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0002_comment_thread_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='track',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Ревизия'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0003_track_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Playlist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(default='Без названия', max_length=200, verbose_name='Название плейлиста')),
+                ('kind', models.CharField(choices=[('playlist', 'Плейлист'), ('queue', 'Очередь воспроизведения')], default='playlist', max_length=20, verbose_name='Тип')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playlists', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Плейлист',
+                'verbose_name_plural': 'Плейлисты',
+            },
+        ),
+        migrations.CreateModel(
+            name='PlaylistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.BigIntegerField(verbose_name='Позиция')),
+                ('added_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='music.playlist', verbose_name='Плейлист')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playlist_entries', to='music.track', verbose_name='Трек')),
+            ],
+            options={
+                'verbose_name': 'Запись плейлиста',
+                'verbose_name_plural': 'Записи плейлиста',
+                'ordering': ['position', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='playlist',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'queue')), fields=('owner',), name='playlist_one_queue_per_owner'),
+        ),
+        migrations.AddIndex(
+            model_name='playlistentry',
+            index=models.Index(fields=['playlist', 'position'], name='playlist_entry_order_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:13
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Уже существующий каталог попадает в журнал как созданный: первая синхронизация
+    # с since=0 возвращает его целиком.
+    ChangeLog = apps.get_model('music', 'ChangeLog')
+    for name in ('genre', 'artist', 'album', 'track', 'comment'):
+        ids = apps.get_model('music', name).objects.order_by('pk').values_list('pk', flat=True)
+        ChangeLog.objects.bulk_create(
+            (ChangeLog(model=name, object_id=pk, action='create') for pk in ids.iterator()), batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0004_playlists'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Номер изменения')),
+                ('model', models.CharField(choices=[('genre', 'Жанр'), ('artist', 'Исполнитель'), ('album', 'Альбом'), ('track', 'Трек'), ('comment', 'Комментарий')], max_length=20, verbose_name='Модель')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('action', models.CharField(choices=[('create', 'Создание'), ('update', 'Изменение'), ('delete', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение каталога',
+                'verbose_name_plural': 'Журнал изменений',
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['model', 'object_id', 'seq'], name='changelog_object_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import Max
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
@@ -67,6 +71,7 @@ class Track(models.Model):
     artists = models.ManyToManyField(Artist, related_name="tracks", verbose_name="Исполнители")
     genres = models.ManyToManyField(Genre, related_name="tracks", blank=True, verbose_name="Жанры")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    revision = models.PositiveIntegerField(default=0, editable=False, verbose_name="Ревизия")
 
     def __str__(self):
         return self.title
@@ -88,4 +93,199 @@ class Comment(models.Model):
 
     class Meta:
         verbose_name = "Комментарий"
-        verbose_name_plural = "Комментарии"
\ No newline at end of file
+        verbose_name_plural = "Комментарии"
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['track', 'created_at', 'id'], name='comment_track_thread_idx'),
+        ]
+
+
+class Playlist(models.Model):
+    KIND_PLAYLIST = 'playlist'
+    KIND_QUEUE = 'queue'
+    KIND_CHOICES = [
+        (KIND_PLAYLIST, 'Плейлист'),
+        (KIND_QUEUE, 'Очередь воспроизведения'),
+    ]
+
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="playlists", verbose_name="Владелец")
+    title = models.CharField(max_length=200, verbose_name="Название плейлиста", default="Без названия")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_PLAYLIST, verbose_name="Тип")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    def __str__(self):
+        return self.title
+
+    # Порядок записей хранится в разреженных ключах position с шагом POSITION_GAP:
+    # вставка и перемещение меняют одну строку (ключ посередине между соседями),
+    # перенумерация всего списка нужна, только когда между соседями не осталось места.
+
+    def _lock(self):
+        # UPDATE блокирует строку плейлиста до конца транзакции: параллельные правки
+        # одного списка выполняются по очереди. Заодно обновляется updated_at.
+        Playlist.objects.filter(pk=self.pk).update(updated_at=timezone.now())
+
+    def _position_after(self, after, exclude=None):
+        """Ключ для записи, которая встанет сразу после after (None — в начало)."""
+        entries = self.entries.order_by('position', 'id')
+        if exclude is not None:
+            entries = entries.exclude(pk=exclude.pk)
+        if after is None:
+            first = entries.values_list('position', flat=True).first()
+            return 0 if first is None else first - PlaylistEntry.POSITION_GAP
+        following = entries.filter(position__gt=after.position).values_list('position', flat=True).first()
+        if following is None:
+            return after.position + PlaylistEntry.POSITION_GAP
+        if following - after.position > 1:
+            return (after.position + following) // 2
+        self.rebalance()
+        after.refresh_from_db(fields=['position'])
+        return after.position + PlaylistEntry.POSITION_GAP // 2
+
+    @transaction.atomic
+    def append(self, track):
+        self._lock()
+        last = self.entries.aggregate(last=Max('position'))['last']
+        position = 0 if last is None else last + PlaylistEntry.POSITION_GAP
+        return self.entries.create(track=track, position=position)
+
+    @transaction.atomic
+    def insert(self, track, after=None):
+        self._lock()
+        return self.entries.create(track=track, position=self._position_after(after))
+
+    @transaction.atomic
+    def move(self, entry, after=None):
+        self._lock()
+        entry.position = self._position_after(after, exclude=entry)
+        entry.save(update_fields=['position'])
+        return entry
+
+    @transaction.atomic
+    def reorder(self, entry_ids):
+        """Задаёт полный порядок записей одним bulk_update."""
+        self._lock()
+        entries = self.entries.in_bulk(entry_ids)
+        for index, entry_id in enumerate(entry_ids):
+            entries[entry_id].position = index * PlaylistEntry.POSITION_GAP
+        PlaylistEntry.objects.bulk_update(entries.values(), ['position'])
+
+    def rebalance(self):
+        self.reorder(list(self.entries.order_by('position', 'id').values_list('pk', flat=True)))
+
+    class Meta:
+        verbose_name = "Плейлист"
+        verbose_name_plural = "Плейлисты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner'], condition=models.Q(kind='queue'), name='playlist_one_queue_per_owner',
+            ),
+        ]
+
+
+class PlaylistEntry(models.Model):
+    POSITION_GAP = 1 << 20
+
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name="entries", verbose_name="Плейлист")
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name="playlist_entries", verbose_name="Трек")
+    position = models.BigIntegerField(verbose_name="Позиция")
+    added_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
+
+    def __str__(self):
+        return f"{self.playlist.title}: {self.track.title}"
+
+    class Meta:
+        verbose_name = "Запись плейлиста"
+        verbose_name_plural = "Записи плейлиста"
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(fields=['playlist', 'position'], name='playlist_entry_order_idx'),
+        ]
+
+
+class CacheGeneration(models.Model):
+    """Токен поколения для кэшей в памяти процессов (например, индекса фасетов).
+
+    Хранится в базе, поэтому смену поколения после записи в одном процессе видят все
+    рабочие процессы, независимо от настроек CACHES.
+    """
+    key = models.CharField(max_length=50, primary_key=True, verbose_name="Ключ")
+    token = models.CharField(max_length=32, verbose_name="Токен")
+
+    def __str__(self):
+        return f"{self.key}: {self.token}"
+
+    @classmethod
+    def current(cls, key):
+        return cls.objects.filter(key=key).values_list('token', flat=True).first()
+
+    @classmethod
+    def bump(cls, key):
+        token = uuid.uuid4().hex
+        if not cls.objects.filter(key=key).update(token=token):
+            cls.objects.update_or_create(key=key, defaults={'token': token})
+
+    class Meta:
+        verbose_name = "Поколение кэша"
+        verbose_name_plural = "Поколения кэшей"
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений каталога для инкрементальной синхронизации (/api/changes/).
+
+    seq растёт монотонно и не переиспользуется после удаления записей: клиент
+    запоминает последний полученный seq и запрашивает только то, что изменилось после него.
+    """
+    ACTION_CREATE = 'create'
+    ACTION_UPDATE = 'update'
+    ACTION_DELETE = 'delete'
+    ACTION_CHOICES = [
+        (ACTION_CREATE, 'Создание'),
+        (ACTION_UPDATE, 'Изменение'),
+        (ACTION_DELETE, 'Удаление'),
+    ]
+    MODEL_CHOICES = [
+        ('genre', 'Жанр'),
+        ('artist', 'Исполнитель'),
+        ('album', 'Альбом'),
+        ('track', 'Трек'),
+        ('comment', 'Комментарий'),
+    ]
+
+    seq = models.BigAutoField(primary_key=True, verbose_name="Номер изменения")
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name="Модель")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name="Действие")
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name="Время изменения")
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.model}:{self.object_id}"
+
+    @classmethod
+    def record(cls, model, object_ids, action=ACTION_UPDATE):
+        """Пишет по записи на каждый объект; model — класс модели или её model_name."""
+        name = model if isinstance(model, str) else model._meta.model_name
+        cls.objects.bulk_create([cls(model=name, object_id=pk, action=action) for pk in object_ids])
+
+    @classmethod
+    def compact(cls, before):
+        """Удаляет записи старше before, у которых есть более поздняя запись о том же объекте.
+
+        От объекта остаётся только последнее изменение (или метка удаления), поэтому
+        клиент с любым since по-прежнему получает актуальное состояние всех объектов,
+        изменённых после since, а журнал растёт с размером каталога, а не с числом правок.
+        """
+        later = cls.objects.filter(
+            model=models.OuterRef('model'), object_id=models.OuterRef('object_id'), seq__gt=models.OuterRef('seq'),
+        )
+        stale = cls.objects.filter(changed_at__lt=before).filter(models.Exists(later))
+        return stale.delete()[0]
+
+    class Meta:
+        verbose_name = "Изменение каталога"
+        verbose_name_plural = "Журнал изменений"
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'seq'], name='changelog_object_idx'),
+        ]
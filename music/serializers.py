@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Artist, Album, Track, Comment
+from .models import Artist, Album, Track, Comment, Genre, Playlist, PlaylistEntry
 
 class ArtistSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,11 +19,65 @@ class TrackSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Track
-        fields = '__all__'
+        exclude = ('revision',)
 
 class CommentSerializer(serializers.ModelSerializer):
     track = TrackSerializer(read_only=True)
 
     class Meta:
         model = Comment
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class CommentThreadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Comment
+        fields = ('id', 'track', 'author_name', 'text', 'created_at')
+        read_only_fields = ('track',)
+
+
+class PlaylistSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Playlist
+        fields = ('id', 'title', 'kind', 'created_at', 'updated_at')
+        read_only_fields = ('kind',)
+
+class PlaylistEntrySerializer(serializers.ModelSerializer):
+    track = TrackSerializer(read_only=True)
+
+    class Meta:
+        model = PlaylistEntry
+        fields = ('id', 'track', 'position', 'added_at')
+
+class PlaylistDetailSerializer(PlaylistSerializer):
+    entries = PlaylistEntrySerializer(many=True, read_only=True)
+
+    class Meta(PlaylistSerializer.Meta):
+        fields = PlaylistSerializer.Meta.fields + ('entries',)
+
+class PlaylistEntryWriteSerializer(serializers.Serializer):
+    """track — для добавления; after — id записи, после которой встать
+    (null — в начало, без поля — в конец)."""
+    track = serializers.PrimaryKeyRelatedField(queryset=Track.objects.filter(status=Track.STATUS_APPROVED), required=False)
+    after = serializers.IntegerField(required=False, allow_null=True)
+
+class PlaylistReorderSerializer(serializers.Serializer):
+    entries = serializers.ListField(child=serializers.IntegerField(), allow_empty=True)
+
+
+# Плоские представления для журнала изменений (/api/changes/): связи передаются
+# идентификаторами, чтобы переименование исполнителя не требовало пересылать его треки.
+
+class GenreSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Genre
+        fields = '__all__'
+
+class SyncAlbumSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Album
+        fields = '__all__'
+
+class SyncTrackSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Track
+        exclude = ('revision',)
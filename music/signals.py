@@ -0,0 +1,178 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import facets
+from .models import Album, Artist, ChangeLog, Comment, Genre, Track
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(sender, instance, created, **kwargs):
+    if not created:
+        return
+    from .events import broker
+    transaction.on_commit(lambda: broker.publish(instance.track_id, instance.id))
+
+
+# Ревизия трека меняется при любом изменении данных, которые попадают в его
+# представление в API; по ней инвалидируется кэш сериализованных строк.
+
+def touch_tracks(tracks):
+    tracks.update(revision=F('revision') + 1)
+
+
+# Ревизия сохранённого трека поднимается в самом UPDATE (revision = revision + 1):
+# значение из памяти могло устареть, и его запись откатила бы ревизию назад.
+
+@receiver(pre_save, sender=Track)
+def bump_track_revision(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.revision = (instance.revision or 0) + 1
+    else:
+        instance.revision = F('revision') + 1
+
+
+@receiver(post_save, sender=Track)
+def reload_track_revision(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is not None and 'revision' not in update_fields:
+        touch_tracks(Track.objects.filter(pk=instance.pk))
+    instance.refresh_from_db(fields=['revision'])
+
+
+@receiver(m2m_changed, sender=Track.artists.through)
+@receiver(m2m_changed, sender=Track.genres.through)
+def touch_tracks_on_relations_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_tracks(Track.objects.filter(pk=instance.pk))
+    elif action in ('post_add', 'post_remove'):
+        touch_tracks(Track.objects.filter(pk__in=pk_set))
+    elif action == 'pre_clear':
+        related_name = 'artists' if sender is Track.artists.through else 'genres'
+        touch_tracks(Track.objects.filter(**{related_name: instance}))
+
+
+@receiver(m2m_changed, sender=Album.artists.through)
+def touch_tracks_on_album_artists_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_tracks(Track.objects.filter(album=instance))
+    elif action in ('post_add', 'post_remove'):
+        touch_tracks(Track.objects.filter(album__in=pk_set))
+    elif action == 'pre_clear':
+        touch_tracks(Track.objects.filter(album__artists=instance))
+
+
+@receiver(post_save, sender=Artist)
+def touch_tracks_on_artist_change(sender, instance, created, **kwargs):
+    if not created:
+        touch_tracks(Track.objects.filter(Q(artists=instance) | Q(album__artists=instance)))
+
+
+@receiver(post_save, sender=Album)
+def touch_tracks_on_album_change(sender, instance, created, **kwargs):
+    if not created:
+        touch_tracks(Track.objects.filter(album=instance))
+
+
+# Удаление исполнителя, альбома или жанра убирает строки связей каскадом
+# (без m2m_changed), а album=NULL ставится запросом UPDATE, поэтому ревизию
+# затронутых треков поднимаем до удаления.
+
+@receiver(pre_delete, sender=Artist)
+def touch_tracks_on_artist_delete(sender, instance, **kwargs):
+    touch_tracks(Track.objects.filter(Q(artists=instance) | Q(album__artists=instance)))
+
+
+@receiver(pre_delete, sender=Album)
+def touch_tracks_on_album_delete(sender, instance, **kwargs):
+    touch_tracks(Track.objects.filter(album=instance))
+
+
+@receiver(pre_delete, sender=Genre)
+def touch_tracks_on_genre_delete(sender, instance, **kwargs):
+    touch_tracks(Track.objects.filter(genres=instance))
+
+
+# Индекс фасетов перестраивается после коммита любого изменения каталога
+# (один раз на транзакцию, см. facets.invalidate_on_commit).
+
+@receiver(post_save, sender=Track)
+@receiver(post_delete, sender=Track)
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_delete, sender=Album)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(m2m_changed, sender=Track.artists.through)
+@receiver(m2m_changed, sender=Track.genres.through)
+def invalidate_facets(sender, using=None, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        facets.invalidate_on_commit(using)
+
+
+# Журнал изменений для /api/changes/. Запись добавляется в той же транзакции,
+# что и само изменение, поэтому откат не оставляет в журнале лишних записей.
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Track)
+@receiver(post_save, sender=Comment)
+def log_save(sender, instance, created, **kwargs):
+    ChangeLog.record(sender, [instance.pk], ChangeLog.ACTION_CREATE if created else ChangeLog.ACTION_UPDATE)
+
+
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Track)
+@receiver(post_delete, sender=Comment)
+def log_delete(sender, instance, **kwargs):
+    ChangeLog.record(sender, [instance.pk], ChangeLog.ACTION_DELETE)
+
+
+RELATIONS = {
+    Track.artists.through: (Track, 'artists'),
+    Track.genres.through: (Track, 'genres'),
+    Album.artists.through: (Album, 'artists'),
+}
+
+
+@receiver(m2m_changed, sender=Track.artists.through)
+@receiver(m2m_changed, sender=Track.genres.through)
+@receiver(m2m_changed, sender=Album.artists.through)
+def log_relations_change(sender, instance, action, reverse, pk_set, **kwargs):
+    owner, field = RELATIONS[sender]
+    if action in ('post_add', 'post_remove') and not pk_set:
+        return
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            ChangeLog.record(owner, [instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        ChangeLog.record(owner, pk_set)
+    elif action == 'pre_clear':
+        ChangeLog.record(owner, owner.objects.filter(**{field: instance}).values_list('pk', flat=True))
+
+
+# Удаление исполнителя, жанра или альбома меняет связанные треки и альбомы
+# без m2m_changed (строки связей и album=NULL удаляются/обновляются запросом).
+
+@receiver(pre_delete, sender=Artist)
+def log_artist_relations_on_delete(sender, instance, **kwargs):
+    ChangeLog.record(Track, instance.tracks.values_list('pk', flat=True))
+    ChangeLog.record(Album, instance.albums.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Genre)
+def log_genre_relations_on_delete(sender, instance, **kwargs):
+    ChangeLog.record(Track, instance.tracks.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Album)
+def log_album_tracks_on_delete(sender, instance, **kwargs):
+    ChangeLog.record(Track, instance.track_set.values_list('pk', flat=True))
@@ -1,11 +1,35 @@
-from django.test import TestCase, Client
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import LiveServerTestCase, TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Track, Artist, Album, Genre, Comment, CustomUser
+from django.core.management import call_command
+from .models import Track, Artist, Album, Genre, Comment, CustomUser, Playlist, ChangeLog
+
+
+def use_temp_media(testcase):
+    """Загруженные в тесте файлы пишутся во временный MEDIA_ROOT, а не в media/."""
+    media_root = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    testcase.addCleanup(settings_override.disable)
+    return media_root
 
 
 class ModelTestCase(TestCase):
     def setUp(self):
+        use_temp_media(self)
         self.user = CustomUser.objects.create(email="test@test.com", username="anon")
         self.genre, _ = Genre.objects.get_or_create(name="Рок", code="rock")
         self.artist, _ = Artist.objects.get_or_create(name="Кипелов")
@@ -58,6 +82,7 @@ class ModelTestCase(TestCase):
 
 class ViewTestCase(TestCase):
     def setUp(self):
+        use_temp_media(self)
         self.client = Client()
         self.user = CustomUser.objects.create(email="user@test.com", username="user")
         self.genre, _ = Genre.objects.get_or_create(name="Поп", code="pop")
@@ -115,3 +140,816 @@ class APITestCase(TestCase):
         data = response.json()
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0]['name'], "DDT")
+
+
+class CommentThreadTestCase(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        self.client = Client()
+        self.user = CustomUser.objects.create(email="listener@test.com", username="listener")
+        self.track = Track.objects.create(
+            title="Ветер",
+            uploaded_by=self.user,
+            audio_file=SimpleUploadedFile("wind.mp3", b"fake"),
+            status='approved'
+        )
+        for i in range(3):
+            Comment.objects.create(track=self.track, author_name=f"Гость {i}", text=f"Комментарий {i}")
+
+    def test_thread_is_ordered_and_slim(self):
+        url = reverse('track-comment-list', args=[self.track.pk])
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([c['text'] for c in data['results']], ["Комментарий 0", "Комментарий 1"])
+        self.assertEqual(data['results'][0]['track'], self.track.pk)
+        next_page = self.client.get(data['next']).json()
+        self.assertEqual([c['text'] for c in next_page['results']], ["Комментарий 2"])
+
+    def test_post_comment_to_thread(self):
+        url = reverse('track-comment-list', args=[self.track.pk])
+        response = self.client.post(url, {'author_name': "Слушатель", 'text': "Отлично"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.track.comments.count(), 4)
+
+    def test_thread_for_missing_track(self):
+        response = self.client.get(reverse('track-comment-list', args=[self.track.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('track-comment-stream', args=[self.track.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comment_list_rejects_invalid_track(self):
+        response = self.client.get(reverse('comment-list'), {'track': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_broker_delivers_published_comment(self):
+        from .events import broker
+        subscriber = broker.subscribe(42)
+        try:
+            await asyncio.to_thread(broker.publish, 42, 7)
+            event = await asyncio.wait_for(subscriber[1].get(), 1)
+            self.assertEqual(event, 7)
+        finally:
+            broker.unsubscribe(42, subscriber)
+
+    @staticmethod
+    def parse_event(chunk):
+        fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+        return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+    @override_settings(COMMENT_STREAM_POLL_SECONDS=0.05)
+    async def test_stream_replays_backlog_and_polls_database(self):
+        from .events import stream_comments
+        first, second, third = [comment.id async for comment in Comment.objects.filter(track=self.track)]
+        stream = stream_comments(self.track.pk, last_id=first)
+        try:
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+            event_id, kind, data = self.parse_event(await anext(stream))
+            self.assertEqual((event_id, kind, data['text'], data['track']), (second, 'comment', "Комментарий 1", self.track.pk))
+            self.assertEqual(self.parse_event(await anext(stream))[0], third)
+            # Внутри транзакции теста on_commit не срабатывает, и брокер молчит — как будто
+            # комментарий записал другой рабочий процесс; поток находит его опросом базы.
+            comment = await Comment.objects.acreate(track=self.track, author_name="Сосед", text="Из другого процесса")
+            event_id, _, data = self.parse_event(await asyncio.wait_for(anext(stream), 2))
+            self.assertEqual((event_id, data['text']), (comment.id, "Из другого процесса"))
+        finally:
+            await stream.aclose()
+
+    @override_settings(COMMENT_STREAM_POLL_SECONDS=0.05)
+    async def test_stream_without_last_event_id_starts_from_now(self):
+        from .events import stream_comments
+        stream = stream_comments(self.track.pk)
+        try:
+            await anext(stream)
+            comment = await Comment.objects.acreate(track=self.track, author_name="Гость", text="Новый")
+            self.assertEqual(self.parse_event(await asyncio.wait_for(anext(stream), 2))[0], comment.id)
+        finally:
+            await stream.aclose()
+
+
+class ThrottlingTestCase(TestCase):
+    def setUp(self):
+        from .throttling import store
+        store.reset()
+        self.client = Client()
+
+    @override_settings(THROTTLE_RATES={'autocomplete-artists': '2/min'})
+    def test_plain_view_is_throttled(self):
+        url = reverse('autocomplete-artists')
+        self.assertEqual(self.client.get(url, {'q': 'a'}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'q': 'ab'}).status_code, 200)
+        response = self.client.get(url, {'q': 'abc'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    @override_settings(THROTTLE_RATES={}, THROTTLE_DEFAULT_API_RATE='1/min')
+    def test_api_view_is_throttled(self):
+        self.assertEqual(self.client.get(reverse('artist-list')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('artist-list')).status_code, 429)
+
+    @override_settings(THROTTLE_ENABLED=False, THROTTLE_DEFAULT_API_RATE='1/min')
+    def test_throttling_can_be_disabled(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('artist-list')).status_code, 200)
+
+    def test_bucket_refills_over_time(self):
+        from .throttling import TokenBucketStore
+        now = [0.0]
+        bucket = TokenBucketStore(clock=lambda: now[0])
+        self.assertEqual(bucket.consume('k', 2, 60), 0)
+        self.assertEqual(bucket.consume('k', 2, 60), 0)
+        self.assertAlmostEqual(bucket.consume('k', 2, 60), 30)
+        now[0] = 30.0
+        self.assertEqual(bucket.consume('k', 2, 60), 0)
+
+    def test_cache_store_is_shared_between_processes(self):
+        from django.core.cache import cache
+        from .throttling import SlidingWindowCacheStore
+        cache.clear()
+        now = [1200.0]
+        # Два экземпляра — как два рабочих процесса с общим кэшем.
+        first = SlidingWindowCacheStore(clock=lambda: now[0])
+        second = SlidingWindowCacheStore(clock=lambda: now[0])
+        self.assertEqual(first.consume('k', 2, 60), 0)
+        self.assertEqual(second.consume('k', 2, 60), 0)
+        self.assertAlmostEqual(first.consume('k', 2, 60), 60)
+        self.assertAlmostEqual(asyncio.run(second.aconsume('k', 2, 60)), 60)
+        # Середина следующего окна: половина прошлых запросов уже вышла из скользящего окна.
+        now[0] = 1290.0
+        self.assertEqual(second.consume('k', 2, 60), 0)
+        self.assertAlmostEqual(first.consume('k', 2, 60), 30)
+
+    def test_cache_store_does_not_deny_parallel_requests_under_limit(self):
+        from django.core.cache import cache
+        from .throttling import SlidingWindowCacheStore
+        cache.clear()
+        store = SlidingWindowCacheStore()
+        denied = []
+
+        def client():
+            for _ in range(10):
+                if store.consume('shared-ip', 1000, 60):
+                    denied.append(1)
+
+        threads = [threading.Thread(target=client) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(denied, [])
+        self.assertGreater(store.consume('shared-ip', 200, 60), 0)
+
+    @override_settings(THROTTLE_STORE='cache', THROTTLE_RATES={'autocomplete-artists': '1/min'})
+    def test_plain_view_is_throttled_with_cache_store(self):
+        from django.core.cache import cache
+        cache.clear()
+        url = reverse('autocomplete-artists')
+        self.assertEqual(self.client.get(url, {'q': 'a'}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'q': 'ab'}).status_code, 429)
+
+    @override_settings(THROTTLE_RATES={'autocomplete-artists': '2/min'})
+    def test_middleware_runs_under_asgi(self):
+        from django.test import AsyncClient
+        from .throttling import ThrottleMiddleware
+
+        async def requests():
+            client = AsyncClient()
+            url = reverse('autocomplete-artists')
+            return [(await client.get(url, {'q': 'a'})).status_code for _ in range(3)]
+
+        self.assertTrue(ThrottleMiddleware.async_capable)
+        self.assertEqual(asyncio.run(requests()), [200, 200, 429])
+
+    def test_check_warns_about_process_local_store(self):
+        from django.core.checks import run_checks
+        from .checks import check_throttle_cache, check_throttle_store
+        with override_settings(THROTTLE_STORE='local'):
+            self.assertNotIn('music.W001', [w.id for w in run_checks()])
+            self.assertIn('music.W001', [w.id for w in run_checks(include_deployment_checks=True)])
+        with override_settings(THROTTLE_STORE='cache'):
+            self.assertEqual(check_throttle_store(None), [])
+            self.assertEqual([w.id for w in check_throttle_cache(None)], ['music.W002'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://x'}}
+        with override_settings(THROTTLE_STORE='cache', CACHES=redis):
+            self.assertEqual(check_throttle_cache(None), [])
+
+    @override_settings(THROTTLE_RATES={'login': '1/min'})
+    def test_form_scopes_limit_only_submissions(self):
+        url = reverse('login')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.post(url, {'email': 'x@test.com', 'password': 'x'}).status_code, 200)
+        self.assertEqual(self.client.post(url, {'email': 'x@test.com', 'password': 'x'}).status_code, 429)
+
+
+class S3StandInHandler(BaseHTTPRequestHandler):
+    """Минимальная замена S3: PUT/GET/HEAD/DELETE объектов в памяти."""
+    objects = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_PUT(self):
+        if not self.headers.get('Authorization', '').startswith('AWS4-HMAC-SHA256'):
+            return self._reply(403)
+        self.objects[self.path] = self.rfile.read(int(self.headers['Content-Length']))
+        self._reply(200)
+
+    def do_GET(self):
+        if self.path not in self.objects:
+            return self._reply(404)
+        self._reply(200, self.objects[self.path])
+
+    do_HEAD = do_GET
+
+    def do_DELETE(self):
+        self.objects.pop(self.path, None)
+        self._reply(204)
+
+
+class StorageTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def test_sharded_upload_path(self):
+        from .storage import ShardedFileSystemStorage, is_sharded
+        storage = ShardedFileSystemStorage(location=self.media_root)
+        name = storage.save(storage.generate_filename('tracks/song.mp3'), ContentFile(b'audio'))
+        self.assertTrue(is_sharded(name))
+        self.assertTrue(name.startswith('tracks/'))
+        other = storage.save(storage.generate_filename('tracks/song.mp3'), ContentFile(b'audio'))
+        self.assertNotEqual(name, other)
+        self.assertTrue(is_sharded(other))
+
+    def test_common_names_spread_across_shards(self):
+        from .storage import ShardedFileSystemStorage, is_sharded
+        storage = ShardedFileSystemStorage(location=self.media_root)
+        names = [storage.save(storage.generate_filename('tracks/track.mp3'), ContentFile(b'a')) for _ in range(30)]
+        self.assertTrue(all(is_sharded(name) for name in names))
+        self.assertGreater(len({os.path.dirname(name) for name in names}), 25)
+        self.assertGreater(sum(os.path.basename(name) == 'track.mp3' for name in names), 25)
+
+    def test_shard_media_command_relocates_files(self):
+        from .storage import is_sharded
+        user = CustomUser.objects.create(email="owner@test.com", username="owner")
+        with override_settings(MEDIA_ROOT=self.media_root):
+            track = Track.objects.create(uploaded_by=user, audio_file='tracks/old.mp3', status='approved')
+            os.makedirs(os.path.join(self.media_root, 'tracks'))
+            with open(os.path.join(self.media_root, 'tracks', 'old.mp3'), 'wb') as f:
+                f.write(b'old audio')
+            call_command('shard_media', workers=2, stdout=io.StringIO())
+            track.refresh_from_db()
+            self.assertTrue(is_sharded(track.audio_file.name))
+            with track.audio_file.open('rb') as f:
+                self.assertEqual(f.read(), b'old audio')
+            self.assertFalse(track.audio_file.storage.exists('tracks/old.mp3'))
+
+    def test_s3_storage_against_stand_in(self):
+        from .storage import S3Storage
+        server = ThreadingHTTPServer(('127.0.0.1', 0), S3StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        storage = S3Storage(
+            endpoint_url=f'http://127.0.0.1:{server.server_port}', bucket='music',
+            access_key='key', secret_key='secret',
+        )
+        name = storage.save(storage.generate_filename('tracks/песня.mp3'), ContentFile(b'x' * 200000))
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(storage.size(name), 200000)
+        with storage.open(name) as f:
+            self.assertEqual(b''.join(f.chunks(4096)), b'x' * 200000)
+        self.assertTrue(storage.url(name).startswith(f'http://127.0.0.1:{server.server_port}/music/tracks/'))
+        storage.delete(name)
+        self.assertFalse(storage.exists(name))
+
+
+class StartupBudgetTestCase(TestCase):
+    def test_production_worker_cold_start_budget(self):
+        out = io.StringIO()
+        call_command(
+            'startup_profile',
+            settings_module='musiclib.settings_production',
+            limit=0,
+            max_seconds=5,
+            max_rss_mb=200,
+            forbid=['rest_framework', 'django.contrib.admin'],
+            stdout=out,
+        )
+        self.assertIn("Бюджеты запуска соблюдены", out.getvalue())
+
+
+class TrackFastPathTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = CustomUser.objects.create(email="fast@test.com", username="fast")
+        artists = [Artist.objects.create(name=f"Исполнитель {i}") for i in range(5)]
+        genres = [Genre.objects.create(name=f"Жанр {i}", code=f"g{i}") for i in range(3)]
+        albums = []
+        for i in range(10):
+            album = Album.objects.create(title=f"Альбом {i}", year=2000 + i)
+            album.artists.add(artists[i % 5], artists[(i + 1) % 5])
+            albums.append(album)
+        for i in range(60):
+            track = Track.objects.create(
+                title=f"Трек {i}",
+                uploaded_by=self.user,
+                audio_file=f"tracks/ab/cd/track{i}.mp3",
+                album=albums[i % 10] if i % 7 else None,
+                status='approved'
+            )
+            track.artists.add(artists[i % 5], artists[(i + 2) % 5])
+            track.genres.add(genres[i % 3])
+
+    def serializer_page(self, request_path):
+        from rest_framework.test import APIRequestFactory
+        from rest_framework.request import Request
+        from .serializers import TrackSerializer
+        request = Request(APIRequestFactory().get(request_path))
+        tracks = (
+            Track.objects.filter(status='approved').select_related('album')
+            .prefetch_related('artists', 'genres').order_by('id')
+        )
+        return TrackSerializer(tracks, many=True, context={'request': request}).data
+
+    def test_fast_path_matches_serializer(self):
+        response = self.client.get(reverse('track-list'), {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(self.serializer_page('/api/tracks/'))))
+
+    def test_cached_rows_follow_revision(self):
+        self.client.get(reverse('track-list'))
+        artist = Artist.objects.get(name="Исполнитель 0")
+        artist.name = "Переименован"
+        artist.save()
+        content = self.client.get(reverse('track-list'), {'page_size': 100}).content.decode()
+        self.assertIn("Переименован", content)
+        self.assertNotIn("Исполнитель 0", content)
+
+    def test_cached_rows_follow_artist_delete(self):
+        self.client.get(reverse('track-list'), {'page_size': 100})
+        Artist.objects.get(name="Исполнитель 0").delete()
+        content = self.client.get(reverse('track-list'), {'page_size': 100}).content.decode()
+        self.assertNotIn("Исполнитель 0", content)
+
+    def test_cached_rows_follow_album_delete(self):
+        self.client.get(reverse('track-list'), {'page_size': 100})
+        Album.objects.get(title="Альбом 0").delete()
+        content = self.client.get(reverse('track-list'), {'page_size': 100}).content.decode()
+        self.assertNotIn("Альбом 0", content)
+
+    def test_cached_rows_follow_genre_delete(self):
+        self.client.get(reverse('track-list'), {'page_size': 100})
+        genre = Genre.objects.get(code="g0")
+        genre_pk = genre.pk
+        genre.delete()
+        results = self.client.get(reverse('track-list'), {'page_size': 100}).json()['results']
+        self.assertFalse([track for track in results if genre_pk in track['genres']])
+
+    def test_page_query_count(self):
+        # count, строки страницы и 5 запросов проекции при пустом кэше; при тёплом — только первые два.
+        with self.assertNumQueries(7):
+            self.client.get(reverse('track-list'), {'page_size': 50})
+        with self.assertNumQueries(2):
+            self.client.get(reverse('track-list'), {'page_size': 50})
+
+    def test_revision_is_bumped_in_database(self):
+        # Устаревший экземпляр не должен откатывать ревизию: её поднимает UPDATE.
+        track = Track.objects.get(title="Трек 0")
+        stale = Track.objects.get(pk=track.pk)
+        track.save()
+        stale.save()
+        self.assertEqual(stale.revision, track.revision + 1)
+        stale.save(update_fields=['title'])
+        self.assertEqual(Track.objects.get(pk=track.pk).revision, track.revision + 2)
+        self.assertEqual(stale.revision, track.revision + 2)
+
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command('bench_tracks', page_size=10, repeat=1, stdout=out)
+        self.assertIn("serializer", out.getvalue())
+        self.assertIn("fast, warm", out.getvalue())
+
+
+class AdminChangelistTestCase(TestCase):
+    # Сессия, пользователь, оценка числа строк, COUNT(*), строки страницы (+ жанры и фильтр у треков).
+    EXPECTED_QUERIES = {'track': 7, 'album': 5, 'artist': 5, 'comment': 5}
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email="admin@test.com", username="admin", password="secret")
+        self.client.force_login(self.admin)
+
+    def add_catalog(self, count, prefix):
+        for i in range(count):
+            artist = Artist.objects.create(name=f"{prefix} исполнитель {i}")
+            album = Album.objects.create(title=f"{prefix} альбом {i}")
+            album.artists.add(artist)
+            genre = Genre.objects.create(name=f"{prefix} жанр {i}", code=f"{prefix}-{i}")
+            track = Track.objects.create(
+                title=f"{prefix} трек {i}", uploaded_by=self.admin, audio_file="tracks/x.mp3", album=album, status='approved'
+            )
+            track.artists.add(artist)
+            track.genres.add(genre)
+            Comment.objects.create(track=track, text="Комментарий")
+
+    def test_changelist_query_counts_do_not_grow(self):
+        for count, prefix in ((2, 'a'), (25, 'b')):
+            self.add_catalog(count, prefix)
+            for model, expected in self.EXPECTED_QUERIES.items():
+                with self.subTest(model=model, rows=count), self.assertNumQueries(expected):
+                    response = self.client.get(reverse(f'admin:music_{model}_changelist'))
+                    self.assertEqual(response.status_code, 200)
+
+    def test_list_search_matches_substring_and_autocomplete_matches_prefix(self):
+        Artist.objects.create(name="The Beatles")
+        Artist.objects.create(name="Beatles Tribute")
+        response = self.client.get(reverse('admin:music_artist_changelist'), {'q': 'Beatles'})
+        self.assertContains(response, "The Beatles")
+        self.assertContains(response, "Beatles Tribute")
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'Beatles', 'app_label': 'music', 'model_name': 'track', 'field_name': 'artists',
+        })
+        self.assertEqual([item['text'] for item in response.json()['results']], ["Beatles Tribute"])
+
+    def test_estimated_count_for_large_tables(self):
+        from django.db import connection
+        from .admin import EstimatedCountPaginator, estimate_row_count
+        self.add_catalog(3, 'c')
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(estimate_row_count(Track), 3)
+        paginator = EstimatedCountPaginator(Track.objects.order_by('pk'), 10)
+        paginator.threshold = 1
+        self.assertEqual(paginator.count, 3)
+        filtered = EstimatedCountPaginator(Track.objects.filter(title__startswith="c трек 1").order_by('pk'), 10)
+        filtered.threshold = 1
+        self.assertEqual(filtered.count, 1)
+
+
+class PlaylistTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="dj@test.com", username="dj")
+        self.client.force_login(self.user)
+        self.tracks = []
+        for i in range(4):
+            album = Album.objects.create(title=f"Пластинка {i}")
+            artist = Artist.objects.create(name=f"Артист {i}")
+            album.artists.add(artist)
+            track = Track.objects.create(
+                title=f"Трек {i}", uploaded_by=self.user, audio_file=f"tracks/p{i}.mp3", album=album, status='approved'
+            )
+            track.artists.add(artist)
+            self.tracks.append(track)
+        self.playlist = Playlist.objects.create(owner=self.user, title="Дорога")
+
+    def titles(self, playlist=None):
+        playlist = playlist or self.playlist
+        return [entry.track.title for entry in playlist.entries.select_related('track')]
+
+    def test_insert_and_move_touch_single_rows(self):
+        first = self.playlist.append(self.tracks[0])
+        last = self.playlist.append(self.tracks[1])
+        middle = self.playlist.insert(self.tracks[2], after=first)
+        head = self.playlist.insert(self.tracks[3], after=None)
+        self.assertEqual(self.titles(), ["Трек 3", "Трек 0", "Трек 2", "Трек 1"])
+        self.assertTrue(first.position < middle.position < last.position)
+        self.playlist.move(head, after=last)
+        self.assertEqual(self.titles(), ["Трек 0", "Трек 2", "Трек 1", "Трек 3"])
+
+    def test_rebalance_when_gap_is_exhausted(self):
+        first = self.playlist.append(self.tracks[0])
+        self.playlist.append(self.tracks[1])
+        for _ in range(25):
+            self.playlist.insert(self.tracks[2], after=first)
+        positions = list(self.playlist.entries.values_list('position', flat=True))
+        self.assertEqual(len(positions), len(set(positions)))
+        self.assertEqual(self.titles()[0], "Трек 0")
+        self.assertEqual(self.titles()[-1], "Трек 1")
+
+    def test_playlist_detail_in_constant_queries(self):
+        for track in self.tracks:
+            self.playlist.append(track)
+        url = reverse('playlist-detail', args=[self.playlist.pk])
+        # Сессия, пользователь, плейлист, записи с треками и альбомами, исполнители, жанры, исполнители альбомов.
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertEqual([e['track']['title'] for e in response.json()['entries']], [t.title for t in self.tracks])
+        for track in self.tracks:
+            self.playlist.append(track)
+        with self.assertNumQueries(7):
+            self.client.get(url)
+
+    def test_entry_api(self):
+        entries_url = reverse('playlist-entry-list', args=[self.playlist.pk])
+        first = self.client.post(entries_url, {'track': self.tracks[0].pk}, content_type='application/json').json()
+        second = self.client.post(entries_url, {'track': self.tracks[1].pk}, content_type='application/json').json()
+        self.client.post(entries_url, {'track': self.tracks[2].pk, 'after': None}, content_type='application/json')
+        self.assertEqual(self.titles(), ["Трек 2", "Трек 0", "Трек 1"])
+        response = self.client.patch(
+            reverse('playlist-entry-detail', args=[self.playlist.pk, second['id']]),
+            {'after': None}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(), ["Трек 1", "Трек 2", "Трек 0"])
+        response = self.client.delete(reverse('playlist-entry-detail', args=[self.playlist.pk, first['id']]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.titles(), ["Трек 1", "Трек 2"])
+
+    def test_bulk_reorder(self):
+        entries = [self.playlist.append(track) for track in self.tracks]
+        url = reverse('playlist-reorder', args=[self.playlist.pk])
+        new_order = [entries[2].pk, entries[0].pk, entries[3].pk, entries[1].pk]
+        response = self.client.post(url, {'entries': new_order}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e['id'] for e in response.json()['entries']], new_order)
+        response = self.client.post(url, {'entries': new_order[:2]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_foreign_playlist_and_queue(self):
+        stranger = CustomUser.objects.create(email="stranger@test.com", username="stranger")
+        foreign = Playlist.objects.create(owner=stranger, title="Чужой")
+        self.assertEqual(self.client.get(reverse('playlist-detail', args=[foreign.pk])).status_code, 404)
+        queue = self.client.get(reverse('play-queue')).json()
+        self.assertEqual(queue['kind'], 'queue')
+        self.assertEqual(self.client.get(reverse('play-queue')).json()['id'], queue['id'])
+        self.assertEqual([p['id'] for p in self.client.get(reverse('playlist-list')).json()['results']], [self.playlist.pk])
+
+
+class FacetTestCase(TestCase):
+    def setUp(self):
+        # Данные «коммитятся» сразу, чтобы отложенная инвалидация из setUp не висела в транзакции теста.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = CustomUser.objects.create(email="facet@test.com", username="facet")
+            self.rock = Genre.objects.create(name="Рок", code="rock")
+            self.jazz = Genre.objects.create(name="Джаз", code="jazz")
+            self.kino = Artist.objects.create(name="Кино")
+            self.aria = Artist.objects.create(name="Ария")
+            album = Album.objects.create(title="Группа крови")
+            specs = [
+                ("Звезда", [self.rock], [self.kino], album),
+                ("Кукушка", [self.rock], [self.kino], None),
+                ("Осень", [self.jazz], [self.kino], None),
+                ("Беспечный ангел", [self.rock], [self.aria], None),
+                ("Штиль", [self.rock, self.jazz], [self.aria], None),
+            ]
+            for title, genres, artists, track_album in specs:
+                track = Track.objects.create(
+                    title=title, uploaded_by=self.user, audio_file="tracks/f.mp3", album=track_album, status='approved'
+                )
+                track.genres.set(genres)
+                track.artists.set(artists)
+            hidden = Track.objects.create(title="Звезда (демо)", uploaded_by=self.user, audio_file="tracks/f.mp3")
+            hidden.genres.add(self.rock)
+
+    def test_counts_without_filters(self):
+        from .facets import facet_counts
+        counts = facet_counts()
+        self.assertEqual(counts['total'], 5)
+        self.assertEqual(counts['genres'], {self.rock.pk: 4, self.jazz.pk: 2})
+        self.assertEqual(counts['artists'], {self.kino.pk: 3, self.aria.pk: 2})
+
+    def test_counts_follow_other_filters(self):
+        from .facets import facet_counts
+        counts = facet_counts(genre='jazz')
+        self.assertEqual(counts['total'], 2)
+        self.assertEqual(counts['genres'][self.rock.pk], 4)
+        self.assertEqual(counts['artists'], {self.kino.pk: 1, self.aria.pk: 1})
+        counts = facet_counts(search='Звезд', artist='Кино')
+        self.assertEqual(counts['total'], 1)
+        counts = facet_counts(search='крови')
+        self.assertEqual(counts['genres'][self.rock.pk], 1)
+        counts = facet_counts(search='Ария')
+        self.assertEqual(counts['total'], 2)
+
+    def test_index_rebuilds_after_commit(self):
+        from .facets import facet_counts
+        self.assertEqual(facet_counts()['total'], 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Track.objects.filter(title="Осень").get().delete()
+        self.assertEqual(facet_counts()['genres'][self.jazz.pk], 1)
+
+    def test_generation_is_shared_through_database(self):
+        from .facets import facet_counts
+        from .models import CacheGeneration
+        self.assertEqual(facet_counts()['total'], 5)
+        # Запись в другом рабочем процессе: трек удалён, токен поколения заменён в базе.
+        Track.objects.filter(title="Осень").delete()
+        self.assertEqual(facet_counts()['total'], 5)
+        CacheGeneration.objects.filter(key='facets').update(token='other-worker')
+        self.assertEqual(facet_counts()['total'], 4)
+
+    def test_home_page_shows_counts(self):
+        response = self.client.get(reverse('home'), {'genre': 'jazz'})
+        self.assertContains(response, "Рок (4)")
+        self.assertContains(response, "Кино (1)")
+
+    def test_counts_match_feed(self):
+        from .facets import facet_counts
+        for params in ({'search': 'звезда'}, {'search': 'Звезда'}, {'search': 'ГРУППА'}, {'search': 'рок'},
+                       {'artist': 'кино'}, {'artist': 'Кино', 'genre': 'rock'}, {'search': 'Ш', 'genre': 'jazz'}):
+            response = self.client.get(reverse('home'), params)
+            counts = facet_counts(params.get('search', ''), params.get('genre', ''), params.get('artist', ''))
+            self.assertEqual(counts['total'], response.context['page_obj'].paginator.count, params)
+
+    def test_invalidation_runs_once_per_transaction(self):
+        from .facets import _PendingInvalidation
+        with self.captureOnCommitCallbacks() as callbacks:
+            blues = Genre.objects.create(name="Блюз", code="blues")
+            Track.objects.get(title="Осень").genres.add(blues)
+            self.kino.name = "Кино (live)"
+            self.kino.save()
+        self.assertEqual(len([func for func in callbacks if isinstance(func, _PendingInvalidation)]), 1)
+
+    def test_sparse_postings_match_bitmaps(self):
+        import random
+        from .facets import Postings, _bitmap
+        rng = random.Random(7)
+        size = 400
+        postings = {key: rng.sample(range(size), rng.choice([1, 3, 40, 200])) for key in range(60)}
+        index = Postings(postings, size)
+        self.assertTrue(index.sparse and index.dense)
+        for mask in (index.full, 0, _bitmap(rng.sample(range(size), 30), size), _bitmap(rng.sample(range(size), 350), size)):
+            expected = {key: n for key, positions in postings.items() if (n := sum(mask >> i & 1 for i in positions))}
+            self.assertEqual(index.counts(mask), expected)
+        self.assertEqual(index.bitmap([0, 1]), _bitmap(postings[0] + postings[1], size))
+
+
+class LoadTestHarnessTestCase(LiveServerTestCase):
+    def setUp(self):
+        self.media_root = use_temp_media(self)
+        settings_override = override_settings(THROTTLE_ENABLED=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_seed_catalog(self):
+        call_command('seed_catalog', tracks=40, artists=10, albums=5, comments=30, audio_files=2,
+                     audio_size=1024, stdout=io.StringIO())
+        self.assertEqual(Track.objects.filter(status='approved').count(), 40)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertTrue(CustomUser.objects.get(email='loadtest@example.com').check_password('loadtest-password'))
+        self.assertFalse(Track.objects.filter(artists=None).exists())
+
+    def test_report_percentiles_and_spikes(self):
+        from .loadtest import Stats, parse_mix, percentile
+        self.assertEqual(percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 0.5), 5)
+        self.assertEqual(percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 0.99), 10)
+        self.assertEqual(parse_mix('feed=3,search=1'), {'feed': 3.0, 'search': 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix('feed=1,dance=2')
+        stats = Stats()
+        for second in range(4):
+            for _ in range(10):
+                stats.record('feed', stats.started + second, 0.01, 200)
+        for _ in range(10):
+            stats.record('upload', stats.started + 4, 0.5, 500, locked=True)
+        report = stats.report(duration=5)
+        self.assertEqual(report['endpoints']['feed']['errors'], 0)
+        self.assertEqual(report['endpoints']['upload']['locked'], 10)
+        self.assertEqual({(spike['second'], spike['kind']) for spike in report['spikes']},
+                         {(4, 'lock'), (4, 'errors'), (4, 'latency')})
+        lenient = stats.report(duration=5, error_threshold=1.0)
+        self.assertNotIn('errors', {spike['kind'] for spike in lenient['spikes']})
+
+    def test_short_run_against_live_server(self):
+        from .loadtest import LoadTest
+        call_command('seed_catalog', tracks=30, artists=8, albums=4, comments=10, audio_files=1,
+                     audio_size=1024, stdout=io.StringIO())
+        # Без DEBUG тестовый сервер не раздаёт media, поэтому сценарий аудио здесь не участвует.
+        # Один слушатель: LiveServerTestCase делит одно соединение SQLite в памяти между потоками
+        # сервера, и параллельные записи в нём дают случайные 500.
+        mix = {'feed': 2, 'search': 1, 'autocomplete': 1, 'comment': 1, 'upload': 1}
+        loadtest = LoadTest(self.live_server_url, mix=mix, concurrency=1, duration=1.5, seed=3,
+                            email='loadtest@example.com', password='loadtest-password')
+        report = asyncio.run(loadtest.run())
+        self.assertGreater(report['requests'], 0)
+        self.assertTrue({'feed', 'search', 'autocomplete'} & set(report['endpoints']))
+        for endpoint, stats in report['endpoints'].items():
+            self.assertEqual(stats['errors'], 0, (endpoint, stats['statuses']))
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+
+    def test_comments_after_login_pass_csrf(self):
+        from .loadtest import LoadTest
+        call_command('seed_catalog', tracks=10, artists=4, albums=2, comments=0, audio_files=1,
+                     audio_size=1024, stdout=io.StringIO())
+        # Один слушатель: комментарии идут и до, и после входа в scenario_upload.
+        loadtest = LoadTest(self.live_server_url, mix={'comment': 2, 'upload': 1}, concurrency=1, duration=1.5,
+                            seed=5, email='loadtest@example.com', password='loadtest-password')
+        report = asyncio.run(loadtest.run())
+        self.assertEqual({'comment', 'upload', 'login'}, set(report['endpoints']))
+        for endpoint in ('comment', 'upload'):
+            self.assertNotIn(403, report['endpoints'][endpoint]['statuses'])
+            self.assertEqual(report['endpoints'][endpoint]['errors'], 0)
+
+
+class ChangeFeedTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="sync@test.com", username="sync")
+        self.rock = Genre.objects.create(name="Рок", code="rock")
+        self.kino = Artist.objects.create(name="Кино")
+        self.track = Track.objects.create(title="Звезда", uploaded_by=self.user, audio_file="tracks/f.mp3", status='approved')
+
+    def last_seq(self):
+        return ChangeLog.objects.order_by('seq').last().seq
+
+    def changes(self, since=0, **params):
+        response = self.client.get(reverse('change-feed'), {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_log_covers_saves_deletes_and_relations(self):
+        since = self.last_seq()
+        self.track.artists.add(self.kino)
+        self.kino.tracks.remove(self.track)
+        self.rock.tracks.add(self.track)
+        self.kino.name = "Кино (группа)"
+        self.kino.save()
+        comment = Comment.objects.create(track=self.track, text="Класс")
+        rock_pk = self.rock.pk
+        self.rock.delete()
+        entries = list(ChangeLog.objects.filter(seq__gt=since).values_list('model', 'object_id', 'action'))
+        self.assertEqual(entries, [
+            ('track', self.track.pk, 'update'),
+            ('track', self.track.pk, 'update'),
+            ('track', self.track.pk, 'update'),
+            ('artist', self.kino.pk, 'update'),
+            ('comment', comment.pk, 'create'),
+            ('track', self.track.pk, 'update'),
+            ('genre', rock_pk, 'delete'),
+        ])
+
+    def test_feed_returns_latest_state_once_per_object(self):
+        since = self.last_seq()
+        self.track.artists.add(self.kino)
+        self.track.title = "Звезда по имени Солнце"
+        self.track.save()
+        pending = Track.objects.create(title="Черновик", uploaded_by=self.user, audio_file="tracks/f.mp3")
+        data = self.changes(since)
+        self.assertFalse(data['has_more'])
+        self.assertEqual(data['next'], self.last_seq())
+        self.assertEqual([(c['model'], c['id'], c['action']) for c in data['changes']], [
+            ('track', self.track.pk, 'update'),
+            ('track', pending.pk, 'delete'),
+        ])
+        self.assertEqual(data['changes'][0]['data']['title'], "Звезда по имени Солнце")
+        self.assertEqual(data['changes'][0]['data']['artists'], [self.kino.pk])
+        self.assertEqual(self.changes(data['next'])['changes'], [])
+
+    def test_batches_cover_every_change(self):
+        since = self.last_seq()
+        artists = [Artist.objects.create(name=f"Исполнитель {i}") for i in range(7)]
+        seen, cursor = [], since
+        while True:
+            data = self.changes(cursor, limit=3)
+            seen.extend(change['id'] for change in data['changes'])
+            cursor = data['next']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, [artist.pk for artist in artists])
+
+    def test_feed_queries_do_not_grow_with_changes(self):
+        for i in range(20):
+            track = Track.objects.create(title=f"Трек {i}", uploaded_by=self.user, audio_file="tracks/f.mp3", status='approved')
+            track.genres.add(self.rock)
+            Comment.objects.create(track=track, text="Комментарий")
+        # журнал + по запросу на жанры, исполнителей, треки (+2 prefetch) и комментарии
+        with self.assertNumQueries(7):
+            self.changes(0)
+
+    def test_compaction_keeps_latest_entry_per_object(self):
+        since = self.last_seq()
+        for title in ("Раз", "Два", "Три"):
+            self.track.title = title
+            self.track.save()
+        kino_pk = self.kino.pk
+        self.kino.delete()
+        before = self.changes(since)['changes']
+        removed = ChangeLog.compact(timezone.now() + timedelta(seconds=1))
+        self.assertGreaterEqual(removed, 3)
+        self.assertEqual(ChangeLog.objects.filter(model='track', object_id=self.track.pk).count(), 1)
+        self.assertTrue(ChangeLog.objects.filter(model='artist', object_id=kino_pk, action='delete').exists())
+        self.assertEqual(self.changes(since)['changes'], before)
+        track_change = next(c for c in self.changes(0)['changes'] if c['model'] == 'track')
+        self.assertEqual(track_change['data']['title'], "Три")
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=30)
+    def test_recent_entries_wait_for_settle_window(self):
+        since = self.last_seq()
+        self.track.title = "Новое название"
+        self.track.save()
+        data = self.changes(since)
+        self.assertEqual((data['changes'], data['next']), ([], since))
+        ChangeLog.objects.filter(seq__gt=since).update(changed_at=timezone.now() - timedelta(seconds=31))
+        self.assertEqual([c['id'] for c in self.changes(since)['changes']], [self.track.pk])
+
+    def test_invalid_since(self):
+        response = self.client.get(reverse('change-feed'), {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,244 @@
+# music/throttling.py
+"""
+Ограничение частоты запросов.
+
+Хранилище лимитов выбирает settings.THROTTLE_STORE:
+- 'cache' — общий кэш Django (settings.THROTTLE_CACHE), счётчик скользящего
+  окна на атомарных incr: лимит клиента видят все рабочие процессы, так что
+  он не умножается на их число;
+- 'local' — token bucket в памяти процесса, для разработки и тестов.
+
+Лимиты задаются в settings.THROTTLE_RATES по имени URL; ключ корзины —
+пользователь, если он вошёл, иначе IP-адрес клиента.
+
+Для обычных Django-представлений лимиты применяет ThrottleMiddleware
+(работает и в синхронном, и в асинхронном режиме), для DRF — TokenBucketThrottle
+(music/api_throttling.py, загружается вместе с API, а не при старте процесса).
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+MAX_BUCKETS = 100000
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60.0); None -> None."""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), float(PERIODS[period[0]])
+
+
+def take_token(tokens, updated, now, capacity, refill):
+    """Пересчитывает корзину на момент now и забирает токен.
+    Возвращает (оставшиеся токены, секунды ожидания или 0)."""
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / refill
+
+
+class TokenBucketStore:
+    """Корзины в памяти процесса: для разработки и тестов."""
+
+    def __init__(self, max_buckets=MAX_BUCKETS, clock=time.monotonic):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self._max_buckets = max_buckets
+        self._clock = clock
+
+    def consume(self, key, capacity, period):
+        """Забирает токен из корзины. Возвращает 0, если запрос разрешён,
+        иначе число секунд до появления следующего токена."""
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, wait = take_token(tokens, updated, now, capacity, capacity / period)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self._max_buckets:
+                # Вытесняем корзину, к которой дольше всех не обращались.
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def aconsume(self, key, capacity, period):
+        return self.consume(key, capacity, period)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SlidingWindowCacheStore:
+    """Лимиты в общем кэше Django: счётчик скользящего окна на атомарном incr.
+
+    Запросы считаются в окнах длиной period (ключ throttle:<ключ>:<номер окна>);
+    оценка нагрузки — счётчик текущего окна плюс доля предыдущего, ещё не
+    вышедшая из скользящего окна. Обычно это два обращения к кэшу (incr и get)
+    без блокировок, так что параллельные запросы одного клиента не мешают друг
+    другу. Отказ откатывает свой incr и не расходует лимит. Время берётся
+    по time.time(), общему для всех процессов.
+    """
+
+    def __init__(self, alias=None, clock=time.time):
+        self._alias = alias
+        self._clock = clock
+
+    def _cache(self):
+        return caches[self._alias or getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+    def _keys(self, key, period):
+        now = self._clock()
+        window = int(now // period)
+        # Счётчик живёт два окна: следующее окно читает его как предыдущее.
+        return f'throttle:{key}:{window}', f'throttle:{key}:{window - 1}', now / period - window, math.ceil(2 * period)
+
+    @staticmethod
+    def _wait(current, previous, elapsed, capacity, period):
+        """0, если запрос укладывается в лимит, иначе секунды до освобождения места."""
+        carried = previous * (1 - elapsed)
+        if carried + current <= capacity:
+            return 0
+        until_next_window = (1 - elapsed) * period
+        if not previous:
+            return until_next_window
+        excess = carried + current - capacity
+        return max(1e-3, min(until_next_window, excess / previous * period))
+
+    def consume(self, key, capacity, period):
+        cache = self._cache()
+        current_key, previous_key, elapsed, timeout = self._keys(key, period)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            current = 1 if cache.add(current_key, 1, timeout) else cache.incr(current_key)
+        wait = self._wait(current, cache.get(previous_key, 0), elapsed, capacity, period)
+        if wait:
+            try:
+                cache.decr(current_key)
+            except ValueError:
+                pass
+        return wait
+
+    async def aconsume(self, key, capacity, period):
+        cache = self._cache()
+        current_key, previous_key, elapsed, timeout = self._keys(key, period)
+        try:
+            current = await cache.aincr(current_key)
+        except ValueError:
+            current = 1 if await cache.aadd(current_key, 1, timeout) else await cache.aincr(current_key)
+        wait = self._wait(current, await cache.aget(previous_key, 0), elapsed, capacity, period)
+        if wait:
+            try:
+                await cache.adecr(current_key)
+            except ValueError:
+                pass
+        return wait
+
+
+store = TokenBucketStore()
+cache_store = SlidingWindowCacheStore()
+
+
+def get_store():
+    return cache_store if getattr(settings, 'THROTTLE_STORE', 'local') == 'cache' else store
+
+
+def get_client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_bucket_key(request, scope, user=None):
+    if user is None:
+        user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'{scope}:user:{user.pk}'
+    return f'{scope}:ip:{get_client_ip(request)}'
+
+
+def get_rate(scope, default=None):
+    rates = getattr(settings, 'THROTTLE_RATES', {})
+    return parse_rate(rates.get(scope, default))
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def get_scope_rate(request, scope, default=None):
+    if not getattr(settings, 'THROTTLE_ENABLED', True) or scope is None:
+        return None
+    if request.method in SAFE_METHODS and scope in getattr(settings, 'THROTTLE_UNSAFE_ONLY_SCOPES', ()):
+        # Для входа, регистрации и загрузки лимит считает только отправку формы.
+        return None
+    return get_rate(scope, default)
+
+
+def throttle_wait(request, scope, default=None):
+    """Возвращает время ожидания в секундах или 0, если запрос можно обслужить."""
+    rate = get_scope_rate(request, scope, default)
+    if rate is None:
+        return 0
+    capacity, period = rate
+    return get_store().consume(get_bucket_key(request, scope), capacity, period)
+
+
+async def athrottle_wait(request, scope, default=None):
+    rate = get_scope_rate(request, scope, default)
+    if rate is None:
+        return 0
+    capacity, period = rate
+    user = await request.auser() if hasattr(request, 'auser') else None
+    return await get_store().aconsume(get_bucket_key(request, scope, user), capacity, period)
+
+
+class ThrottleMiddleware:
+    """Лимиты для обычных Django-представлений (вход, регистрация, автодополнение).
+
+    Под ASGI middleware работает асинхронно, чтобы цепочка не переключалась в
+    поток на каждом запросе (см. поток комментариев в music/views.py)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    @staticmethod
+    def is_api_view(view_func):
+        # DRF-представления ограничиваются через TokenBucketThrottle.
+        return hasattr(getattr(view_func, 'cls', None), 'throttle_classes')
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_api_view(view_func):
+            return None
+        return self.limited(throttle_wait(request, request.resolver_match.url_name))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_api_view(view_func):
+            return None
+        return self.limited(await athrottle_wait(request, request.resolver_match.url_name))
+
+    @staticmethod
+    def limited(wait):
+        if not wait:
+            return None
+        response = HttpResponse("Слишком много запросов. Попробуйте позже.", status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
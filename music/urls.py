@@ -1,6 +1,29 @@
 from django.urls import path
+from django.utils.functional import cached_property
 from . import views
 
+
+class LazyAPIView:
+    """DRF-представление из music.api, которое импортируется при первом запросе,
+    а не при загрузке URLconf."""
+    csrf_exempt = True
+
+    def __init__(self, name):
+        self.name = name
+
+    @cached_property
+    def view(self):
+        from . import api
+        return getattr(api, self.name).as_view()
+
+    @property
+    def cls(self):
+        return self.view.cls
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
+
+
 urlpatterns = [
     path('register/', views.register_view, name='register'),
     path('login/', views.login_view, name='login'),
@@ -15,12 +38,21 @@ urlpatterns = [
     path('api/artists/search/', views.autocomplete_artists, name='autocomplete-artists'),
     path('api/albums/search/', views.autocomplete_albums, name='autocomplete-albums'),
 
-    path('api/artists/', views.ArtistList.as_view(), name='artist-list'),
-    path('api/artists/<int:pk>/', views.ArtistDetail.as_view(), name='artist-detail'),
-    path('api/albums/', views.AlbumList.as_view(), name='album-list'),
-    path('api/albums/<int:pk>/', views.AlbumDetail.as_view(), name='album-detail'),
-    path('api/tracks/', views.TrackList.as_view(), name='track-list'),
-    path('api/tracks/<int:pk>/', views.TrackDetail.as_view(), name='track-detail'),
-    path('api/comments/', views.CommentList.as_view(), name='comment-list'),
-    path('api/comments/<int:pk>/', views.CommentDetail.as_view(), name='comment-detail'),
+    path('api/artists/', LazyAPIView('ArtistList'), name='artist-list'),
+    path('api/artists/<int:pk>/', LazyAPIView('ArtistDetail'), name='artist-detail'),
+    path('api/albums/', LazyAPIView('AlbumList'), name='album-list'),
+    path('api/albums/<int:pk>/', LazyAPIView('AlbumDetail'), name='album-detail'),
+    path('api/tracks/', LazyAPIView('TrackList'), name='track-list'),
+    path('api/tracks/<int:pk>/', LazyAPIView('TrackDetail'), name='track-detail'),
+    path('api/tracks/<int:pk>/comments/', LazyAPIView('TrackCommentList'), name='track-comment-list'),
+    path('api/tracks/<int:pk>/comments/stream/', views.comment_stream, name='track-comment-stream'),
+    path('api/comments/', LazyAPIView('CommentList'), name='comment-list'),
+    path('api/comments/<int:pk>/', LazyAPIView('CommentDetail'), name='comment-detail'),
+    path('api/playlists/', LazyAPIView('PlaylistList'), name='playlist-list'),
+    path('api/playlists/<int:pk>/', LazyAPIView('PlaylistDetail'), name='playlist-detail'),
+    path('api/playlists/<int:pk>/entries/', LazyAPIView('PlaylistEntryList'), name='playlist-entry-list'),
+    path('api/playlists/<int:pk>/entries/<int:entry_pk>/', LazyAPIView('PlaylistEntryDetail'), name='playlist-entry-detail'),
+    path('api/playlists/<int:pk>/reorder/', LazyAPIView('PlaylistReorder'), name='playlist-reorder'),
+    path('api/queue/', LazyAPIView('PlayQueue'), name='play-queue'),
+    path('api/changes/', LazyAPIView('ChangeFeed'), name='change-feed'),
 ]
\ No newline at end of file
@@ -5,63 +5,23 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.db.models import Q
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404
 from django.contrib.auth.forms import UserCreationForm
 from django import forms
-from rest_framework import generics, filters
-from rest_framework.pagination import PageNumberPagination
-from .models import CustomUser, Artist, Album, Track, Comment, Genre
-from .serializers import ArtistSerializer, AlbumSerializer, TrackSerializer, CommentSerializer
+from .models import CustomUser, Artist, Album, Track, Genre
 from .forms import TrackUploadForm
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-class ArtistList(generics.ListCreateAPIView):
-    queryset = Artist.objects.all()
-    serializer_class = ArtistSerializer
-    pagination_class = StandardResultsSetPagination
-
-class ArtistDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Artist.objects.all()
-    serializer_class = ArtistSerializer
-
-class AlbumList(generics.ListCreateAPIView):
-    queryset = Album.objects.all()
-    serializer_class = AlbumSerializer
-    pagination_class = StandardResultsSetPagination
-
-class AlbumDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Album.objects.all()
-    serializer_class = AlbumSerializer
-
-class TrackList(generics.ListCreateAPIView):
-    serializer_class = TrackSerializer
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'genres__name', 'artists__name', 'album__title']
-
-    def get_queryset(self):
-        return Track.objects.filter(status=Track.STATUS_APPROVED).select_related('album').prefetch_related('artists', 'genres')
-
-class TrackDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Track.objects.all().select_related('album').prefetch_related('artists', 'genres')
-    serializer_class = TrackSerializer
-
-class CommentList(generics.ListCreateAPIView):
-    serializer_class = CommentSerializer
-    pagination_class = StandardResultsSetPagination
-    def get_queryset(self):
-        track_id = self.request.query_params.get('track')
-        if track_id:
-            return Comment.objects.filter(track_id=track_id)
-        return Comment.objects.all()
-
-class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Comment.objects.all()
-    serializer_class = CommentSerializer
+from .events import stream_comments
+from .facets import facet_counts
+
+async def comment_stream(request, pk):
+    if not await Track.objects.filter(pk=pk, status=Track.STATUS_APPROVED).aexists():
+        raise Http404("Трек не найден.")
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+    response = StreamingHttpResponse(stream_comments(pk, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 def autocomplete_artists(request):
     query = request.GET.get('q', '').strip()
@@ -158,8 +118,13 @@ def home_page(request):
     paginator = Paginator(tracks, page_size)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
-    all_genres = Genre.objects.all()
-    all_artists = Artist.objects.all()
+    facets = facet_counts(search_query, genre_filter, artist_filter)
+    all_genres = list(Genre.objects.all())
+    for genre in all_genres:
+        genre.facet_count = facets['genres'].get(genre.pk, 0)
+    all_artists = list(Artist.objects.all())
+    for artist in all_artists:
+        artist.facet_count = facets['artists'].get(artist.pk, 0)
     context = {
         'page_obj': page_obj,
         'search_query': search_query,
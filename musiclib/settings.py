@@ -48,6 +48,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'music.throttling.ThrottleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,7 +77,7 @@ WSGI_APPLICATION = 'musiclib.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
     }
 }
 
@@ -104,19 +105,87 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / 'media'))
 
-CORS_ALLOW_ALL_ORIGINS = True
+# Хранилище аудио: 'local' — шардированные каталоги в MEDIA_ROOT, 's3' — S3-совместимое хранилище.
+MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'local')
+STORAGES = {
+    'default': {
+        'BACKEND': 'music.storage.S3Storage' if MEDIA_STORAGE == 's3' else 'music.storage.ShardedFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+S3_STORAGE = {
+    'ENDPOINT_URL': os.getenv('S3_ENDPOINT_URL'),
+    'BUCKET': os.getenv('S3_BUCKET'),
+    'ACCESS_KEY': os.getenv('S3_ACCESS_KEY', ''),
+    'SECRET_KEY': os.getenv('S3_SECRET_KEY', ''),
+    'REGION': os.getenv('S3_REGION', 'us-east-1'),
+    'BASE_URL': os.getenv('S3_BASE_URL'),
+}
+
+CORS_ALLOW_ALL_ORIGINS = os.getenv('CORS_ALLOW_ALL_ORIGINS', str(DEBUG)).lower() == 'true'
+CORS_ALLOWED_ORIGINS = [origin for origin in os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if origin]
+
+# Общий кэш для нескольких рабочих процессов (лимиты запросов, кэш строк треков).
+# Без REDIS_URL используется LocMemCache — отдельный в каждом процессе.
+REDIS_URL = os.getenv('REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Лимиты запросов (token bucket): "<число>/<s|min|hour|day>" по имени URL.
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True').lower() == 'true'
+# Где хранятся корзины: 'cache' — общий кэш THROTTLE_CACHE, 'local' — память процесса (разработка).
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'local' if DEBUG else 'cache')
+THROTTLE_CACHE = 'default'
+THROTTLE_DEFAULT_API_RATE = '120/min'
+THROTTLE_RATES = {
+    'login': '10/min',
+    'register': '5/min',
+    'upload': '60/hour',
+    'autocomplete-artists': '60/min',
+    'autocomplete-albums': '60/min',
+    'track-comment-list': '30/min',
+    'track-comment-stream': '30/min',
+}
+# Для этих имён лимит применяется только к POST и другим изменяющим запросам,
+# открытие страницы формы не расходует лимит.
+THROTTLE_UNSAFE_ONLY_SCOPES = ('login', 'register', 'upload')
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'music.api_throttling.TokenBucketThrottle',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
 
+# Журнал изменений (/api/changes/): записи моложе этого окна не отдаются, пока не
+# закоммитятся транзакции, получившие меньший seq раньше. SQLite пишет по одной
+# транзакции, поэтому там окно не нужно.
+CHANGE_FEED_SETTLE_SECONDS = float(os.getenv(
+    'CHANGE_FEED_SETTLE_SECONDS', 0 if DATABASES['default']['ENGINE'].endswith('sqlite3') else 5,
+))
+
+# Как часто SSE-поток комментариев проверяет базу, если его не разбудил брокер
+# своего процесса: столько ждёт комментарий, созданный другим рабочим процессом.
+COMMENT_STREAM_POLL_SECONDS = float(os.getenv('COMMENT_STREAM_POLL_SECONDS', 2))
+
+# Время жизни кэша сериализованных строк треков (ключ включает ревизию трека).
+TRACK_ROW_CACHE_TIMEOUT = 3600
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/'
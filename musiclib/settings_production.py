@@ -0,0 +1,39 @@
+"""
+Облегчённый профиль настроек для рабочих процессов.
+
+DJANGO_SETTINGS_MODULE=musiclib.settings_production
+
+Отличия от musiclib.settings:
+- DEBUG выключен по умолчанию;
+- корзины лимитов запросов хранятся в общем кэше (задайте REDIS_URL);
+- API отдаёт только JSON: BrowsableAPIRenderer и приложение rest_framework
+  (его шаблоны и статика) не загружаются;
+- админка подключается только при ADMIN_ENABLED=True, чтобы процессы,
+  обслуживающие ленту и медиа, не импортировали django.contrib.admin;
+- REST API загружается лениво при первом запросе (см. music/urls.py).
+
+Замерить запуск: python manage.py startup_profile --settings-module musiclib.settings_production
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, REST_FRAMEWORK, os
+
+DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+
+ADMIN_ENABLED = os.getenv('ADMIN_ENABLED', 'False').lower() == 'true'
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app != 'rest_framework' and (ADMIN_ENABLED or app != 'django.contrib.admin')
+]
+
+CORS_ALLOW_ALL_ORIGINS = os.getenv('CORS_ALLOW_ALL_ORIGINS', 'False').lower() == 'true'
+
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'cache')
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ],
+}